@@ -0,0 +1,294 @@
+"""
+Graph-wide statistics of a degrees data directory, computed over its
+compact index (see graph.py) and written as CSV.
+
+    components  size of each connected component of people
+    bacon       degrees of separation of everyone from a hub person
+    sources     reach, eccentricity and closeness of sampled people
+    separation  distribution of the separation of sampled pairs
+
+Searches run breadth-first from up to 64 sources at once, each person
+holding one bit per source in a 64-bit mask, so that a layer of every
+search is a couple of vectorized passes over the CSR arrays. Batches of
+sampled sources are searched by worker processes that each map the same
+saved index.
+
+Usage: python analytics.py COMMAND [directory] [--hub NAME] [--samples N]
+                           [--seed N] [--workers N] [--output FILE]
+"""
+
+import concurrent.futures
+import csv
+import sys
+
+import numpy as np
+
+from graph import Graph, index_path, start_worker, worker_state
+from lookup import NameIndex
+
+# Sources searched at once, one per bit of a mask
+BATCH_SIZE = 64
+
+# People sampled as sources by default
+SAMPLES = 1000
+
+COMMANDS = ["components", "bacon", "sources", "separation"]
+
+
+def spread(graph, sources):
+    """
+    Searches breadth-first from up to BATCH_SIZE people at once. Yields
+    (depth, reached) for each layer, starting with the sources at depth
+    0, where reached[i] has bit b set if person i is first reached at
+    that depth from sources[b].
+    """
+    if len(sources) > BATCH_SIZE:
+        raise ValueError(f"at most {BATCH_SIZE} sources at once")
+
+    # Movies and people with any neighbors, and where their runs of the
+    # CSR arrays start, so reduceat sees no empty runs
+    some_movies, movie_starts = nonempty(graph.movie_offsets)
+    some_people, person_starts = nonempty(graph.person_offsets)
+    movies = np.zeros(len(graph.movie_ids), dtype=np.uint64)
+    people = np.zeros(len(graph.person_ids), dtype=np.uint64)
+
+    frontier = np.zeros(len(graph.person_ids), dtype=np.uint64)
+    for bit, source in enumerate(sources):
+        frontier[source] |= np.uint64(1) << np.uint64(bit)
+    seen = frontier.copy()
+    depth = 0
+    while True:
+        yield (depth, frontier)
+        if len(some_movies) == 0:
+            return
+
+        # A movie carries the searches of any of its stars, and a person
+        # those of any of their movies
+        movies[some_movies] = np.bitwise_or.reduceat(
+            frontier[graph.movie_people], movie_starts
+        )
+        people[some_people] = np.bitwise_or.reduceat(
+            movies[graph.person_movies], person_starts
+        )
+        frontier = people & ~seen
+        if not frontier.any():
+            return
+        seen |= frontier
+        depth += 1
+
+
+def layer_counts(graph, sources):
+    """
+    Returns an array whose row d counts the people at separation d from
+    each of sources, searched at once.
+    """
+    rows = []
+    for _, reached in spread(graph, sources):
+        rows.append(bit_counts(reached, len(sources)))
+    return np.array(rows, dtype=np.int64)
+
+
+def bit_counts(masks, size):
+    """Returns how many of masks have each of the low size bits set."""
+    masks = masks[masks != 0].astype("<u8")
+    bits = np.unpackbits(masks.view(np.uint8).reshape(-1, 8), axis=1,
+                         bitorder="little")
+    return bits[:, :size].sum(axis=0, dtype=np.int64)
+
+
+def nonempty(offsets):
+    """Returns (rows, starts): the nonempty rows of CSR offsets."""
+    offsets = np.asarray(offsets)
+    rows = np.flatnonzero(offsets[1:] > offsets[:-1])
+    return (rows, offsets[rows])
+
+
+def component_labels(graph):
+    """
+    Returns an array giving each person the smallest person or movie
+    number in their connected component, movies being numbered after
+    people.
+    """
+    size = len(graph.person_ids)
+    labels = np.arange(size + len(graph.movie_ids), dtype=np.int64)
+    sources = np.repeat(np.arange(size, dtype=np.int64),
+                        np.diff(graph.person_offsets))
+    targets = np.asarray(graph.person_movies, dtype=np.int64) + size
+
+    # Hook the larger label of each pair of joined components under the
+    # smaller, then point every node straight at its label
+    while True:
+        a, b = labels[sources], labels[targets]
+        apart = a != b
+        if not apart.any():
+            break
+        sources, targets = sources[apart], targets[apart]
+        a, b = a[apart], b[apart]
+        np.minimum.at(labels, np.maximum(a, b), np.minimum(a, b))
+        while True:
+            jumped = labels[labels]
+            if (jumped == labels).all():
+                break
+            labels = jumped
+    return labels[:size]
+
+
+def sample(directory, graph, samples, seed=None, workers=None):
+    """
+    Searches from samples people chosen at random, BATCH_SIZE at a time,
+    with worker processes. Yields (sources, counts) for each batch as
+    layer_counts returns them, in order.
+    """
+    rng = np.random.default_rng(seed)
+    size = len(graph.person_ids)
+    chosen = rng.choice(size, size=min(samples, size), replace=False)
+    batches = [chosen[i:i + BATCH_SIZE].tolist()
+               for i in range(0, len(chosen), BATCH_SIZE)]
+    if len(batches) <= 1 or workers == 1:
+        for sources in batches:
+            yield (sources, layer_counts(graph, sources))
+        return
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=start_worker,
+        initargs=(index_path(directory),)
+    ) as executor:
+        yield from zip(batches, executor.map(count_layers, batches))
+
+
+def count_layers(sources):
+    """Returns layer_counts of sources in a worker process."""
+    return layer_counts(worker_state["graph"], sources)
+
+
+def write_components(graph, writer):
+    """Writes each component's size and smallest person, largest first."""
+    labels = component_labels(graph)
+    roots, firsts, sizes = np.unique(labels, return_index=True,
+                                     return_counts=True)
+    writer.writerow(["component", "size", "person_id", "name"])
+    order = np.lexsort((firsts, -sizes))
+    for component, i in enumerate(order.tolist(), 1):
+        person = int(firsts[i])
+        writer.writerow([component, int(sizes[i]), graph.person_ids[person],
+                         graph.person_names[person]])
+    print(f"{len(roots):,} components, the largest of "
+          f"{int(sizes.max(initial=0)):,} people", file=sys.stderr)
+
+
+def write_bacon(graph, writer, hub):
+    """Writes every person's degrees of separation from hub, if any."""
+    distances = np.full(len(graph.person_ids), -1, dtype=np.int64)
+    for depth, reached in spread(graph, [hub]):
+        distances[reached != 0] = depth
+    writer.writerow(["person_id", "name", "degrees"])
+    for person, distance in enumerate(distances.tolist()):
+        writer.writerow([graph.person_ids[person], graph.person_names[person],
+                         distance if distance >= 0 else ""])
+    found = distances[distances > 0]
+    if len(found):
+        print(f"{graph.person_names[hub]} reaches {len(found):,} people, "
+              f"{found.mean():.3f} degrees away on average and "
+              f"{found.max()} at most", file=sys.stderr)
+
+
+def write_sources(graph, writer, batches):
+    """
+    Writes how many people each sampled source reaches, its eccentricity
+    (the separation of the farthest of them) and its closeness (one over
+    their mean separation).
+    """
+    writer.writerow(["person_id", "name", "reached", "eccentricity",
+                     "mean_separation", "closeness"])
+    eccentricity = 0
+    for sources, counts in batches:
+        depths = np.arange(len(counts))[:, np.newaxis]
+        reached = counts[1:].sum(axis=0)
+        totals = (counts * depths).sum(axis=0)
+        for b, source in enumerate(sources):
+            farthest = int(np.flatnonzero(counts[:, b]).max())
+            eccentricity = max(eccentricity, farthest)
+            mean = totals[b] / reached[b] if reached[b] else None
+            writer.writerow([
+                graph.person_ids[source], graph.person_names[source],
+                int(reached[b]), farthest,
+                "" if mean is None else f"{mean:.4f}",
+                "" if mean is None else f"{1 / mean:.6f}"
+            ])
+    print(f"Largest eccentricity found: {eccentricity} "
+          f"(a lower bound on the diameter)", file=sys.stderr)
+
+
+def write_separation(writer, batches):
+    """Writes how many sampled pairs are each number of degrees apart."""
+    totals = np.zeros(1, dtype=np.int64)
+    for _, counts in batches:
+        counts = counts.sum(axis=1)
+        if len(counts) > len(totals):
+            totals = np.pad(totals, (0, len(counts) - len(totals)))
+        totals[:len(counts)] += counts
+    pairs = int(totals[1:].sum())
+    writer.writerow(["degrees", "pairs", "fraction"])
+    for depth in range(1, len(totals)):
+        writer.writerow([depth, int(totals[depth]),
+                         f"{totals[depth] / pairs:.6f}"])
+    if pairs:
+        mean = (totals * np.arange(len(totals))).sum() / pairs
+        print(f"{pairs:,} connected pairs, {mean:.3f} degrees apart on "
+              f"average", file=sys.stderr)
+
+
+def main():
+    usage = ("Usage: python analytics.py COMMAND [directory] [--hub NAME] "
+             "[--samples N] [--seed N] [--workers N] [--output FILE]")
+    args = sys.argv[1:]
+    options = {"--hub": "Kevin Bacon", "--samples": SAMPLES, "--seed": None,
+               "--workers": None, "--output": None}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            if i + 1 == len(args):
+                sys.exit(f"{option} needs a value")
+            value = args[i + 1]
+            if option in ("--samples", "--seed", "--workers"):
+                if not value.isdigit():
+                    sys.exit(f"{option} needs a number")
+                value = int(value)
+            options[option] = value
+            del args[i:i + 2]
+    if not 1 <= len(args) <= 2 or args[0] not in COMMANDS:
+        sys.exit(usage)
+    command = args[0]
+    directory = args[1] if len(args) == 2 else "large"
+
+    print("Loading data...", file=sys.stderr)
+    graph = Graph.load(directory)
+    print("Data loaded.", file=sys.stderr)
+    output = (sys.stdout if options["--output"] is None
+              else open(options["--output"], "w", encoding="utf-8",
+                        newline=""))
+    try:
+        writer = csv.writer(output)
+        if command == "components":
+            write_components(graph, writer)
+        elif command == "bacon":
+            try:
+                hub = graph.find_person(options["--hub"],
+                                        NameIndex(graph.name_keys))
+            except LookupError as e:
+                sys.exit(str(e))
+            write_bacon(graph, writer, hub)
+        else:
+            batches = sample(directory, graph, options["--samples"],
+                             options["--seed"], options["--workers"])
+            if command == "sources":
+                write_sources(graph, writer, batches)
+            else:
+                write_separation(writer, batches)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
-import csv
 import sys
+import time
 
-from util import Node, StackFrontier, QueueFrontier
+import numpy as np
+
+from ingest import groups, read_rows, read_stars
+from lookup import NameIndex
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,65 +15,119 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact index the data was loaded through, if any (see graph.py)
+graph = None
+
+# Completes and corrects the lowercase names of names (see lookup.py)
+name_index = None
 
-def load_data(directory):
+
+def load_data(directory, workers=None, stats=None):
     """
     Load data from CSV files into memory.
+
+    stars.csv is parsed in chunks by worker processes (see ingest.py).
+    If stats is a dict, the number of rows read and the seconds taken
+    are added to it.
     """
+    global name_index
+    start = time.perf_counter()
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+    rows = read_rows(f"{directory}/people.csv", ["id", "name", "birth"])
+    for person_id, name, birth in rows:
+        people[person_id] = {
+            "name": name,
+            "birth": sys.intern(birth),
+            "movies": set()
+        }
+        key = name.lower()
+        if key not in names:
+            names[key] = {person_id}
+        else:
+            names[key].add(person_id)
+    count = len(rows)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    rows = read_rows(f"{directory}/movies.csv", ["id", "title", "year"])
+    for movie_id, title, year in rows:
+        movies[movie_id] = {
+            "title": title,
+            "year": sys.intern(year),
+            "stars": set()
+        }
+    count += len(rows)
+
+    # Load stars as (person, movie) codes, filling the sets with the id
+    # strings already used as keys of people and movies
+    person_ids, movie_ids = list(people), list(movies)
+    codes, unknown, rows = read_stars(f"{directory}/stars.csv",
+                                      person_ids, movie_ids, workers)
+    size = max(len(movie_ids), 1)
+    for person, found in groups(codes // size, codes % size):
+        people[person_ids[person]]["movies"].update(
+            [movie_ids[movie] for movie in found]
+        )
+    codes = np.sort(codes % size * len(person_ids) + codes // size)
+    for movie, found in groups(codes // len(person_ids),
+                               codes % len(person_ids)):
+        movies[movie_ids[movie]]["stars"].update(
+            [person_ids[person] for person in found]
+        )
+
+    # As before, people keep movies missing from movies.csv
+    for person, movie_id in unknown:
+        people[person_ids[person]]["movies"].add(movie_id)
+    count += rows
+    name_index = NameIndex(sorted(names))
+
+    if stats is not None:
+        stats["rows"] = stats.get("rows", 0) + count
+        stats["seconds"] = (stats.get("seconds", 0)
+                            + time.perf_counter() - start)
+
+
+def load_index(directory):
+    """
+    Load data through a compact index of the CSV files, built and saved
+    in the directory on first use, in place of load_data.
+    """
+    global graph, names, people, movies, name_index
+    from graph import Graph, NamesView, PeopleView, MoviesView
+    graph = Graph.load(directory)
+    names = NamesView(graph)
+    people = PeopleView(graph)
+    movies = MoviesView(graph)
+    name_index = NameIndex(graph.name_keys)
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = sys.argv[1:]
+    index = "--index" in args
+    if index:
+        args.remove("--index")
+    if len(args) > 1:
+        sys.exit("Usage: python degrees.py [--index] [directory]")
+    directory = args[0] if len(args) == 1 else "large"
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    if index:
+        load_index(directory)
+        print("Data loaded.")
+    else:
+        stats = dict()
+        load_data(directory, stats=stats)
+        print("Data loaded.")
+        rate = stats["rows"] / max(stats["seconds"], 1e-9)
+        print(f"Read {stats['rows']:,} rows in {stats['seconds']:.2f}s "
+              f"({rate:,.0f} rows/sec).")
 
     #print(people)
     #print(movies)
     #print(names)
-    source = person_id_for_name(input("Name: "))
-    if source is None:
-        sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
-    if target is None:
-        sys.exit("Person not found.")
+    source = find_person(input("Name: "))
+    target = find_person(input("Name: "))
 
     path = shortest_path(source, target)
 
@@ -92,34 +149,77 @@ def shortest_path(source, target):
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    Searches breadth-first from both people at once, each round
+    expanding a whole layer of whichever side has the smaller frontier,
+    until some person is reached from both sides.
     """
+    if graph is not None:
+        return graph.shortest_path(source, target)
 
-    frontier = QueueFrontier()
-    explored = set()
-    frontier.add(Node(source, None, None))
-    while not frontier.empty():
-        node = frontier.remove()
-        explored.add(node.state)
-        neighbors = neighbors_for_person(node.state)
-        for neighbor in neighbors:
-            _, person_id = neighbor
-            
-            # find a solution
+    # A person is a neighbor of themselves through any of their movies
+    if source == target:
+        for movie_id, person_id in neighbors_for_person(source):
             if person_id == target:
-                path = [neighbor]
-                while node.parent is not None:
-                    path.append(node.action)
-                    node = node.parent
-                path.reverse()
-                return path
-
-            # add node to frontier
-            if person_id not in explored and not frontier.contains_state(person_id):
-                frontier.add(Node(person_id, node, neighbor))
-            
+                return [(movie_id, person_id)]
+        return None
+
+    # Maps each person reached from the source, then from the target, to
+    # the (movie_id, person_id) pair they were reached through
+    parents = [{source: None}, {target: None}]
+    frontiers = [[source], [target]]
+    while frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        mine, theirs = parents[side], parents[1 - side]
+        layer = []
+        for person_id in frontiers[side]:
+            for movie_id, neighbor_id in neighbors_for_person(person_id):
+                if neighbor_id in mine:
+                    continue
+                mine[neighbor_id] = (movie_id, person_id)
+                if neighbor_id in theirs:
+                    return join_path(parents, neighbor_id)
+                layer.append(neighbor_id)
+        frontiers[side] = layer
+
     return None
 
 
+def join_path(parents, person_id):
+    """
+    Returns the (movie_id, person_id) pairs from the source to the
+    target through person_id, where the two searches met.
+    """
+    forward, backward = parents
+    path = []
+    meeting = person_id
+    while forward[person_id] is not None:
+        movie_id, parent_id = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, person_id = backward[person_id]
+        path.append((movie_id, person_id))
+    return path
+
+
+def find_person(name):
+    """
+    Returns the person_id for a name, or exits suggesting similar names
+    if there is no such person.
+    """
+    person_id = person_id_for_name(name)
+    if person_id is not None:
+        return person_id
+    suggestions = name_index.search(name) or name_index.complete(name)
+    if not suggestions:
+        sys.exit("Person not found.")
+    suggestions = ", ".join(people[next(iter(names[key]))]["name"]
+                            for key in suggestions)
+    sys.exit(f"Person not found. Did you mean: {suggestions}?")
 
 
 def person_id_for_name(name):
@@ -0,0 +1,418 @@
+"""
+Compact index of a degrees data directory: people and movies numbered
+in order of their ids, who starred in what as a bipartite adjacency in
+compressed sparse row (CSR) form, and a sorted index of lowercase names,
+all in NumPy arrays. The index is saved next to the CSV files as .npy
+files that later runs map into memory instead of parsing the CSVs.
+"""
+
+import bisect
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+from ingest import read_rows, read_stars
+
+# Lists of strings, each saved as <field>_data.npy and <field>_offsets.npy
+STRINGS = ["person_ids", "person_names", "births", "movie_ids",
+           "movie_titles", "movie_years", "name_keys"]
+
+# Integer arrays, each saved as <field>.npy
+ARRAYS = ["name_people", "person_offsets", "person_movies", "movie_offsets",
+          "movie_people"]
+
+# CSV files the index is built from
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+
+class Strings():
+    """
+    Read-only list of strings stored as UTF-8 bytes back to back in
+    data, string i running from offsets[i] to offsets[i + 1].
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def pack(cls, strings):
+        """Returns Strings holding a list of strings."""
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("string index out of range")
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return bytes(self.data[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def index(self, string):
+        """Returns the index of string, which must be in sorted Strings."""
+        i = bisect.bisect_left(self, string)
+        if i == len(self) or self[i] != string:
+            raise KeyError(string)
+        return i
+
+
+class Graph():
+    """
+    People and movies of a degrees data directory. Person i starred in
+    movies person_movies[person_offsets[i]:person_offsets[i + 1]], and
+    movie j starred people movie_people[movie_offsets[j]:movie_offsets[j + 1]].
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        for field in STRINGS:
+            setattr(self, field, Strings(arrays[f"{field}_data"],
+                                         arrays[f"{field}_offsets"]))
+        for field in ARRAYS:
+            setattr(self, field, arrays[field])
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Opens the index of directory, first building it if it is missing
+        or older than the CSV files.
+        """
+        path = index_path(directory)
+        if not fresh(directory, path):
+            cls.build(directory).save(path)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path):
+        """Maps a saved index into memory."""
+        return cls({name: np.load(os.path.join(path, f"{name}.npy"),
+                                  mmap_mode="r")
+                    for name in files()})
+
+    def save(self, path):
+        """Saves the index as a directory of .npy files."""
+        os.makedirs(path, exist_ok=True)
+        for name in files():
+            np.save(os.path.join(path, f"{name}.npy"), self.arrays[name])
+
+    @classmethod
+    def build(cls, directory, workers=None):
+        """
+        Builds the index from the CSV files of directory, parsing stars.csv
+        with worker processes.
+        """
+        rows = read_rows(f"{directory}/people.csv", ["id", "name", "birth"])
+        people = {row[0]: row[1:] for row in rows}
+        movies = {
+            row[0]: row[1:] for row in
+            read_rows(f"{directory}/movies.csv", ["id", "title", "year"])
+        }
+
+        # Number people and movies in order of their ids
+        person_ids = sorted(people)
+        movie_ids = sorted(movies)
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+
+        # Stars rows naming unknown people or movies are left out
+        stars, _, _ = read_stars(f"{directory}/stars.csv", person_ids,
+                                 movie_ids, workers)
+        stars_people = (stars // max(len(movie_ids), 1)).astype(np.int32)
+        stars_movies = (stars % max(len(movie_ids), 1)).astype(np.int32)
+
+        # Every name given for a person can find them
+        keys = sorted({(name.lower(), person_index[person_id])
+                       for person_id, name, _ in rows})
+
+        strings = {
+            "person_ids": person_ids,
+            "person_names": [people[person_id][0] for person_id in person_ids],
+            "births": [people[person_id][1] for person_id in person_ids],
+            "movie_ids": movie_ids,
+            "movie_titles": [movies[movie_id][0] for movie_id in movie_ids],
+            "movie_years": [movies[movie_id][1] for movie_id in movie_ids],
+            "name_keys": [key for key, _ in keys]
+        }
+        arrays = dict()
+        for field, values in strings.items():
+            packed = Strings.pack(values)
+            arrays[f"{field}_data"] = packed.data
+            arrays[f"{field}_offsets"] = packed.offsets
+        arrays["name_people"] = np.array([i for _, i in keys], dtype=np.int32)
+        arrays["person_offsets"], arrays["person_movies"] = csr(
+            stars_people, stars_movies, len(person_ids)
+        )
+        arrays["movie_offsets"], arrays["movie_people"] = csr(
+            stars_movies, stars_people, len(movie_ids)
+        )
+        return cls(arrays)
+
+    def person_index(self, person_id):
+        """Returns the number of a person id, raising KeyError if unknown."""
+        return self.person_ids.index(person_id)
+
+    def movie_index(self, movie_id):
+        """Returns the number of a movie id, raising KeyError if unknown."""
+        return self.movie_ids.index(movie_id)
+
+    def find_person(self, person, names=None):
+        """
+        Returns the number of a person given by person id or name, raising
+        LookupError if there is no such person or the name is ambiguous.
+        Unknown names suggest close ones from names, a lookup.NameIndex of
+        name_keys, if given.
+        """
+        person = str(person)
+        try:
+            return self.person_index(person)
+        except KeyError:
+            pass
+        people = self.people_named(person)
+        if len(people) == 0:
+            suggestions = names.search(person) if names is not None else []
+            if suggestions:
+                raise LookupError(f"person not found: {person}; did you "
+                                  f"mean: {', '.join(suggestions)}?")
+            raise LookupError(f"person not found: {person}")
+        if len(people) > 1:
+            ids = ", ".join(self.person_ids[i] for i in people)
+            raise LookupError(f"ambiguous name {person}: person ids {ids}")
+        return people[0]
+
+    def people_named(self, name):
+        """Returns the numbers of the people with a name, ignoring case."""
+        key = name.lower()
+        i = bisect.bisect_left(self.name_keys, key)
+        result = []
+        while i < len(self.name_keys) and self.name_keys[i] == key:
+            result.append(int(self.name_people[i]))
+            i += 1
+        return result
+
+    def movies_of(self, person):
+        """Returns the numbers of the movies person starred in."""
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """Returns the numbers of the people who starred in movie."""
+        offsets = self.movie_offsets
+        return self.movie_people[offsets[movie]:offsets[movie + 1]]
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs that
+        connect the person_ids source and target, or None if there is
+        none, like degrees.shortest_path. Searches breadth-first from
+        both people, each round expanding a whole layer of people from
+        whichever side has the smaller frontier, until they meet.
+        """
+        start, goal = self.person_index(source), self.person_index(target)
+
+        # A person is a neighbor of themselves through any of their movies
+        if start == goal:
+            movies = self.movies_of(start)
+            if len(movies) == 0:
+                return None
+            return [(self.movie_ids[int(movies[0])], source)]
+
+        # For the searches from start and from goal: the movie each person
+        # was reached through, and the person each movie was reached from,
+        # or -1 while unreached
+        via_movie = [np.full(len(self.person_ids), -1, dtype=np.int32)
+                     for _ in range(2)]
+        via_person = [np.full(len(self.movie_ids), -1, dtype=np.int32)
+                      for _ in range(2)]
+        via_movie[0][start] = start
+        via_movie[1][goal] = goal
+        frontiers = [np.array([start], dtype=np.int32),
+                     np.array([goal], dtype=np.int32)]
+        while frontiers[0].size and frontiers[1].size:
+            side = 0 if frontiers[0].size <= frontiers[1].size else 1
+            movies, parents = expand(self.person_offsets, self.person_movies,
+                                     frontiers[side])
+            movies = reach(via_person[side], movies, parents)
+            people, parents = expand(self.movie_offsets, self.movie_people,
+                                     movies)
+            frontiers[side] = reach(via_movie[side], people, parents)
+
+            # Any person reached from both sides is on a shortest path
+            met = frontiers[side][via_movie[1 - side][frontiers[side]] != -1]
+            if met.size:
+                return self.path(via_movie, via_person, start, goal,
+                                 int(met[0]))
+        return None
+
+    def path(self, via_movie, via_person, start, goal, meeting):
+        """
+        Returns the (movie_id, person_id) pairs leading from start to goal
+        through meeting, where the searches from each end met.
+        """
+        result = []
+        person = meeting
+        while person != start:
+            movie = int(via_movie[0][person])
+            result.append((self.movie_ids[movie], self.person_ids[person]))
+            person = int(via_person[0][movie])
+        result.reverse()
+
+        person = meeting
+        while person != goal:
+            movie = int(via_movie[1][person])
+            person = int(via_person[1][movie])
+            result.append((self.movie_ids[movie], self.person_ids[person]))
+        return result
+
+
+class PeopleView(Mapping):
+    """Read-only view of a Graph shaped like degrees.people."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person_index(person_id)
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.births[person],
+            "movies": {graph.movie_ids[int(movie)]
+                       for movie in graph.movies_of(person)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """Read-only view of a Graph shaped like degrees.movies."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie_index(movie_id)
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[int(person)]
+                      for person in graph.stars_of(movie)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class NamesView(Mapping):
+    """Read-only view of a Graph shaped like degrees.names."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        people = self.graph.people_named(name)
+        if not people or name != name.lower():
+            raise KeyError(name)
+        return {self.graph.person_ids[person] for person in people}
+
+    def __iter__(self):
+        previous = None
+        for key in self.graph.name_keys:
+            if key != previous:
+                yield key
+            previous = key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+# Index of the data in each worker process
+worker_state = dict()
+
+
+def start_worker(path):
+    """
+    Maps the saved index at path once per worker process. Workers only
+    open an index the parent has already loaded, so none of them can
+    rebuild it over files that other processes have mapped.
+    """
+    worker_state["graph"] = Graph.open(path)
+
+
+def index_path(directory):
+    """Returns where the index of a data directory is saved."""
+    return os.path.join(directory, "index")
+
+
+def files():
+    """Returns the names of the .npy files of an index."""
+    result = []
+    for field in STRINGS:
+        result.extend([f"{field}_data", f"{field}_offsets"])
+    return result + ARRAYS
+
+
+def fresh(directory, path):
+    """Returns whether the index at path is newer than every CSV file."""
+    try:
+        built = min(os.path.getmtime(os.path.join(path, f"{name}.npy"))
+                    for name in files())
+    except OSError:
+        return False
+    return all(os.path.getmtime(os.path.join(directory, source)) <= built
+               for source in SOURCES)
+
+
+def csr(rows, columns, size):
+    """
+    Returns (offsets, targets) listing the columns of each of size rows,
+    given parallel arrays of the rows and columns of every entry.
+    """
+    order = np.lexsort((columns, rows))
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=offsets[1:])
+    return (offsets, columns[order].astype(np.int32))
+
+
+def expand(offsets, targets, sources):
+    """
+    Returns (children, parents): every target of each of the sources in
+    CSR arrays, and the source it was reached from.
+    """
+    starts = offsets[sources]
+    counts = offsets[sources + 1] - starts
+    parents = np.repeat(sources, counts)
+
+    # Position of each child: its source's start plus its rank there
+    ranks = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                counts)
+    return (targets[np.repeat(starts, counts) + ranks], parents)
+
+
+def reach(via, children, parents):
+    """
+    Records the parent of each unreached child in via and returns the
+    newly reached children, once each.
+    """
+    new = via[children] == -1
+    children, parents = children[new], parents[new]
+
+    # A child reached from several parents keeps the last one
+    via[children] = parents
+    return children[via[children] == parents]
@@ -0,0 +1,134 @@
+"""
+Fast reading of the degrees CSV files. Rows are read as tuples of the
+columns needed, and stars.csv, by far the largest file, is parsed in
+chunks by worker processes that turn each row into an integer code for
+its (person, movie) pair.
+"""
+
+import concurrent.futures
+import csv
+import io
+
+import numpy as np
+
+# Bytes of stars.csv parsed by each task
+CHUNK_SIZE = 1 << 22
+
+
+def read_rows(filename, columns):
+    """Returns the named columns of each row of a CSV file as tuples."""
+    with open(filename, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        indexes = [header.index(column) for column in columns]
+        return [tuple(row[i] for i in indexes) for row in reader if row]
+
+
+def read_stars(filename, person_ids, movie_ids, workers=None):
+    """
+    Reads a stars.csv file given lists of the known person and movie ids.
+    Returns (codes, unknown, rows): a sorted array of the distinct codes
+    person * len(movie_ids) + movie of rows naming a known person and
+    movie, a list of (person, movie_id) for rows naming a known person
+    and an unknown movie, and the number of rows read.
+    """
+    with open(filename, "rb") as f:
+        header = f.readline()
+        size = f.seek(0, 2)
+    names = next(csv.reader([header.decode("utf-8")]))
+    columns = (names.index("person_id"), names.index("movie_id"))
+
+    # Each task parses the lines starting in its range of bytes
+    bounds = list(range(len(header), size, CHUNK_SIZE)) + [size]
+    ranges = list(zip(bounds, bounds[1:]))
+    person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+    movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+    state = (person_index, movie_index, columns)
+    if len(ranges) <= 1 or workers == 1:
+        start_worker(*state)
+        results = [parse_stars(filename, start, end) for start, end in ranges]
+        worker_state.clear()
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=start_worker,
+            initargs=state
+        ) as executor:
+            results = list(executor.map(
+                parse_stars, [filename] * len(ranges),
+                [start for start, _ in ranges], [end for _, end in ranges]
+            ))
+
+    codes = [np.zeros(0, dtype=np.int64)]
+    unknown = []
+    rows = 0
+    for chunk_codes, chunk_unknown, chunk_rows in results:
+        codes.append(chunk_codes)
+        unknown.extend(chunk_unknown)
+        rows += chunk_rows
+    codes = np.sort(np.concatenate(codes))
+    codes = codes[np.append(True, codes[1:] != codes[:-1])]
+    return (codes, unknown, rows)
+
+
+# Id numbers and columns of stars.csv in each worker process
+worker_state = dict()
+
+
+def start_worker(person_index, movie_index, columns):
+    """Keeps the id numbers once per worker process."""
+    worker_state["people"] = person_index
+    worker_state["movies"] = movie_index
+    worker_state["columns"] = columns
+
+
+def parse_stars(filename, start, end):
+    """
+    Parses the rows of stars.csv that start between the byte offsets
+    start and end, returning them as read_stars does.
+    """
+    with open(filename, "rb") as f:
+
+        # Skip the end of a line begun before start
+        f.seek(start - 1)
+        f.readline()
+        first = f.tell()
+        if first >= end:
+            return (np.zeros(0, dtype=np.int64), [], 0)
+        data = f.read(end - first)
+        if not data.endswith(b"\n"):
+            data += f.readline()
+
+    people, movies = worker_state["people"], worker_state["movies"]
+    person_column, movie_column = worker_state["columns"]
+    size = max(len(movies), 1)
+    codes = []
+    unknown = []
+    rows = 0
+    for row in csv.reader(io.StringIO(data.decode("utf-8"))):
+        if not row:
+            continue
+        rows += 1
+        person = people.get(row[person_column])
+        if person is None:
+            continue
+        movie = movies.get(row[movie_column])
+        if movie is None:
+            unknown.append((person, row[movie_column]))
+        else:
+            codes.append(person * size + movie)
+    return (np.array(codes, dtype=np.int64), unknown, rows)
+
+
+def groups(keys, values):
+    """
+    Yields (key, list of values) for each run of equal keys in a sorted
+    array of keys and a parallel array of values.
+    """
+    if len(keys) == 0:
+        return
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    ends = np.append(starts[1:], len(keys)).tolist()
+    values = values.tolist()
+    for key, start, end in zip(keys[starts].tolist(), starts.tolist(), ends):
+        yield (key, values[start:end])
@@ -0,0 +1,140 @@
+"""
+Index of lowercase names that completes prefixes and finds the names
+within a few edits of a misspelled one.
+"""
+
+import array
+import bisect
+
+import numpy as np
+
+# Length of the n-grams of the fuzzy index
+GRAM = 3
+
+# Pads names so their first and last letters start and end n-grams
+PAD = "\0"
+
+
+class NameIndex():
+    """
+    Index over a sorted sequence of lowercase names, which may repeat.
+    Prefixes are completed by binary search over the names. Fuzzy search
+    uses an inverted index from each n-gram to the names containing it,
+    built on the first search.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.names = None
+
+    def complete(self, prefix, limit=10):
+        """Returns up to limit distinct names starting with prefix, sorted."""
+        prefix = prefix.lower()
+        result = []
+        i = bisect.bisect_left(self.keys, prefix)
+        while i < len(self.keys) and len(result) < limit:
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            result.append(key)
+
+            # Skip the other people with the same name
+            i = bisect.bisect_right(self.keys, key, i)
+        return result
+
+    def search(self, name, distance=2, limit=10):
+        """
+        Returns up to limit names at most distance edits (insertions,
+        deletions or substitutions of a letter) from name, nearest first.
+        Short names allow fewer edits, so the n-grams can narrow the search.
+        """
+        if self.names is None:
+            self.build()
+        name = name.lower()
+        wanted = grams(name)
+
+        # Each edit changes at most GRAM of name's n-grams, so a match
+        # shares all but distance * GRAM of them, and so contains one of
+        # any distance * GRAM + 1, such as the rarest
+        distance = max(min(distance, (len(wanted) - 1) // GRAM), 0)
+        postings = sorted((self.postings(gram) for gram in wanted), key=len)
+        rare = distance * GRAM + 1
+        candidates, counts = np.unique(np.concatenate(postings[:rare]),
+                                       return_counts=True)
+        near = np.abs(self.lengths[candidates] - len(name)) <= distance
+        candidates, counts = candidates[near], counts[near]
+
+        # Count the other n-grams they share, each posting being sorted
+        for posting in postings[rare:]:
+            if len(candidates) == 0:
+                break
+            found = np.searchsorted(posting, candidates)
+            found[found == len(posting)] = 0
+            counts += posting[found] == candidates
+        candidates = candidates[counts >= len(wanted) - distance * GRAM]
+
+        matches = []
+        for i in candidates.tolist():
+            edits = edit_distance(name, self.names[i], distance)
+            if edits <= distance:
+                matches.append((edits, self.names[i]))
+        matches.sort()
+        return [match for _, match in matches[:limit]]
+
+    def build(self):
+        """Builds the n-gram index of the distinct names."""
+        names = []
+        for key in self.keys:
+            if not names or names[-1] != key:
+                names.append(key)
+
+        # Number the n-grams, then list each one's names in CSR arrays
+        numbers = dict()
+        found_grams = array.array("i")
+        found_names = array.array("i")
+        for i, key in enumerate(names):
+            for gram in grams(key):
+                found_grams.append(numbers.setdefault(gram, len(numbers)))
+                found_names.append(i)
+        found_grams = np.frombuffer(found_grams, dtype=np.int32)
+        found_names = np.frombuffer(found_names, dtype=np.int32)
+        order = np.argsort(found_grams, kind="stable")
+        self.offsets = np.zeros(len(numbers) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(found_grams, minlength=len(numbers)),
+                  out=self.offsets[1:])
+        self.gram_names = found_names[order]
+        self.numbers = numbers
+        self.lengths = np.array([len(key) for key in names], dtype=np.int32)
+        self.names = names
+
+    def postings(self, gram):
+        """Returns the numbers of the names containing gram."""
+        number = self.numbers.get(gram)
+        if number is None:
+            return np.zeros(0, dtype=np.int32)
+        return self.gram_names[self.offsets[number]:self.offsets[number + 1]]
+
+
+def grams(name):
+    """Returns the set of n-grams of name, padded at both ends."""
+    padded = PAD * (GRAM - 1) + name + PAD * (GRAM - 1)
+    return {padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)}
+
+
+def edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between a and b, or limit + 1 as
+    soon as it is known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, letter in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (letter != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
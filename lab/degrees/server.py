@@ -0,0 +1,251 @@
+"""
+Answers many degrees queries against data loaded once. Reads one JSON
+object per line from standard input, such as
+
+    {"source": "Kevin Bacon", "target": "Tom Hanks"}
+
+and writes one JSON answer per line in the same order, or serves the
+same queries over HTTP on a local port, as GET /?source=...&target=...
+or a POST of the JSON object. People are given by name or person id.
+{"complete": prefix} lists names starting with a prefix, and
+{"search": name} the names within two edits of a misspelled one.
+Paths are searched by worker processes that each map the same saved
+index (see graph.py), and answers for recent pairs are cached.
+
+Usage: python server.py [directory] [--http PORT] [--workers N]
+"""
+
+import concurrent.futures
+import json
+import os
+import sys
+import threading
+import urllib.parse
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from graph import Graph, index_path, start_worker, worker_state
+from lookup import NameIndex
+
+# Number of recent (source, target) answers kept
+CACHE_SIZE = 4096
+
+# Queries read ahead of the oldest unanswered one, per worker
+READ_AHEAD = 8
+
+
+class Server():
+    """Answers queries with a pool of worker processes and a cache."""
+
+    def __init__(self, directory, workers=None, cache_size=CACHE_SIZE):
+        self.graph = Graph.load(directory)
+        self.names = NameIndex(self.graph.name_keys)
+        self.workers = workers or os.cpu_count()
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=start_worker,
+            initargs=(index_path(directory),)
+        )
+        self.cache_size = cache_size
+
+        # Paths of recent pairs, least recently used first, and futures
+        # of the pairs being searched
+        self.cache = OrderedDict()
+        self.searches = dict()
+        self.lock = threading.RLock()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def resolve(self, person):
+        """
+        Returns the person_id of a person id or name, raising LookupError
+        if there is no such person or the name is ambiguous.
+        """
+        return self.graph.person_ids[self.graph.find_person(person,
+                                                            self.names)]
+
+    def submit(self, query):
+        """Returns a future of the answer to a query."""
+        future = concurrent.futures.Future()
+        try:
+            if not isinstance(query, dict):
+                raise LookupError("query must be a JSON object")
+            if "complete" in query or "search" in query:
+                future.set_result(self.lookup(query))
+                return future
+            pair = (self.resolve(query.get("source")),
+                    self.resolve(query.get("target")))
+        except LookupError as e:
+            future.set_result(self.answer(query, error=str(e)))
+            return future
+
+        with self.lock:
+            if pair in self.cache:
+                self.cache.move_to_end(pair)
+                future.set_result(self.answer(query, pair, self.cache[pair]))
+                return future
+            search = self.searches.get(pair)
+            if search is None:
+                search = self.executor.submit(find_path, *pair)
+                self.searches[pair] = search
+                search.add_done_callback(
+                    lambda search: self.remember(pair, search)
+                )
+
+        def done(search):
+            try:
+                result = self.answer(query, pair, search.result())
+            except Exception as e:
+                result = self.answer(query, pair, error=repr(e))
+            future.set_result(result)
+        search.add_done_callback(done)
+        return future
+
+    def lookup(self, query):
+        """Answers a query to complete or correct a name."""
+        result = dict()
+        if "id" in query:
+            result["id"] = query["id"]
+        if "complete" in query:
+            result["names"] = self.names.complete(str(query["complete"]))
+        else:
+            result["names"] = self.names.search(str(query["search"]))
+        return result
+
+    def remember(self, pair, search):
+        """Moves a finished search into the cache."""
+        with self.lock:
+            del self.searches[pair]
+            if search.exception() is not None:
+                return
+            self.cache[pair] = search.result()
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def answer(self, query, pair=None, path=None, error=None):
+        """Returns the JSON object answering query."""
+        result = dict()
+        if isinstance(query, dict) and "id" in query:
+            result["id"] = query["id"]
+        if error is not None:
+            result["error"] = error
+            return result
+
+        graph = self.graph
+        source, target = pair
+        result["source"] = source
+        result["target"] = target
+        if path is None:
+            result["degrees"] = None
+            result["path"] = None
+            return result
+
+        result["degrees"] = len(path)
+        result["path"] = []
+        for movie_id, person_id in path:
+            result["path"].append({
+                "movie_id": movie_id,
+                "title": graph.movie_titles[graph.movie_index(movie_id)],
+                "person_id": person_id,
+                "name": graph.person_names[graph.person_index(person_id)]
+            })
+        return result
+
+    def serve_lines(self, lines, output):
+        """
+        Answers a JSON query per line, writing the answers in order while
+        later queries are searched.
+        """
+        pending = deque()
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                future = self.submit(json.loads(line))
+            except ValueError as e:
+                future = concurrent.futures.Future()
+                future.set_result({"error": f"invalid JSON: {e}"})
+            pending.append(future)
+            while pending and (pending[0].done()
+                               or len(pending) > READ_AHEAD * self.workers):
+                write_line(output, pending.popleft().result())
+        while pending:
+            write_line(output, pending.popleft().result())
+
+    def serve_http(self, port, host="127.0.0.1"):
+        """Answers queries over HTTP until interrupted."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                query = dict(urllib.parse.parse_qsl(url.query))
+                self.reply(server.submit(query).result())
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    query = json.loads(self.rfile.read(length))
+                except ValueError as e:
+                    self.reply({"error": f"invalid JSON: {e}"}, 400)
+                    return
+                self.reply(server.submit(query).result())
+
+            def reply(self, result, status=None):
+                if status is None:
+                    status = 400 if "error" in result else 200
+                body = json.dumps(result).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        with ThreadingHTTPServer((host, port), Handler) as httpd:
+            print(f"Serving on http://{host}:{port}/", file=sys.stderr)
+            httpd.serve_forever()
+
+
+def find_path(source, target):
+    """Returns the shortest path between two person_ids, or None."""
+    return worker_state["graph"].shortest_path(source, target)
+
+
+def write_line(output, result):
+    output.write(json.dumps(result) + "\n")
+    output.flush()
+
+
+def main():
+    args = sys.argv[1:]
+    options = {"--http": None, "--workers": None}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            if i + 1 == len(args) or not args[i + 1].isdigit():
+                sys.exit(f"{option} needs a number")
+            options[option] = int(args[i + 1])
+            del args[i:i + 2]
+    if len(args) > 1:
+        sys.exit("Usage: python server.py [directory] [--http PORT] "
+                 "[--workers N]")
+    directory = args[0] if len(args) == 1 else "large"
+
+    print("Loading data...", file=sys.stderr)
+    server = Server(directory, workers=options["--workers"])
+    print("Data loaded.", file=sys.stderr)
+    try:
+        if options["--http"] is not None:
+            server.serve_http(options["--http"])
+        else:
+            server.serve_lines(sys.stdin, sys.stdout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,8 @@
+import heapq
+import itertools
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -7,13 +12,17 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+
+        # Number of nodes in the frontier for each state
+        self.states = dict()
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,10 +31,17 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.forget(node.state)
             return node
 
+    def forget(self, state):
+        """Records that one node with state left the frontier."""
+        if self.states[state] == 1:
+            del self.states[state]
+        else:
+            self.states[state] -= 1
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +49,30 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.forget(node.state)
+            return node
+
+
+class PriorityFrontier(StackFrontier):
+    """Removes the node with lowest priority(node) first, oldest on ties."""
+
+    def __init__(self, priority):
+        super().__init__()
+        self.frontier = []
+        self.priority = priority
+        self.count = itertools.count()
+
+    def add(self, node):
+        heapq.heappush(
+            self.frontier, (self.priority(node), next(self.count), node)
+        )
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            _, _, node = heapq.heappop(self.frontier)
+            self.forget(node.state)
             return node
@@ -1,7 +1,65 @@
+import concurrent.futures
+import heapq
 import itertools
+import math
+import multiprocessing
+import os
+import re
+import threading
+import weakref
+
+ENTAILED = "entailed"
+CONTRADICTED = "contradicted"
+UNKNOWN = "unknown"
+
+
+class EvaluationException(Exception):
+    pass
+
+
+class ParseException(Exception):
+    pass
 
 
 class Sentence():
+    """
+    Logical sentences are immutable and interned: constructing a sentence
+    structurally equal to an existing one returns that same object, so
+    equality is identity. Hash and symbols are computed once, on creation.
+    """
+
+    __slots__ = ("_hash", "_symbols", "__weakref__")
+
+    # Live sentences, keyed by class and arguments, and the lock that
+    # keeps threads from creating two copies of the same sentence
+    _interned = weakref.WeakValueDictionary()
+    _interning = threading.Lock()
+
+    # How tightly the connective binds when rendering formulas
+    precedence = 0
+
+    @classmethod
+    def _intern(cls, arguments, key, symbols, **fields):
+        """Returns the sentence of this class with given arguments."""
+        with Sentence._interning:
+            sentence = Sentence._interned.get((cls, arguments))
+            if sentence is None:
+                sentence = object.__new__(cls)
+                object.__setattr__(sentence, "_hash", hash(key))
+                object.__setattr__(sentence, "_symbols", frozenset(symbols))
+                for field, value in fields.items():
+                    object.__setattr__(sentence, field, value)
+                Sentence._interned[(cls, arguments)] = sentence
+            return sentence
+
+    def __hash__(self):
+        return self._hash
+
+    def __setattr__(self, name, value):
+        raise AttributeError("logical sentences are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("logical sentences are immutable")
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -9,11 +67,49 @@ class Sentence():
 
     def formula(self):
         """Returns string formula representing logical sentence."""
-        return ""
+        parts = []
+        self.render(parts, 0)
+        return "".join(parts)
+
+    def render(self, parts, bound):
+        """
+        Appends the formula to the list parts, parenthesized if the
+        sentence binds no tighter than bound.
+        """
+        if self.precedence <= bound:
+            parts.append("(")
+            self.write(parts)
+            parts.append(")")
+        else:
+            self.write(parts)
+
+    def write(self, parts):
+        """Appends the formula, without outer parentheses, to parts."""
+        pass
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return self._symbols
+
+    def compile(self, symbols=None):
+        """
+        Returns a function that evaluates the logical sentence over a
+        sequence of truth values, one per symbol in the order of symbols.
+        """
+        if symbols is None:
+            symbols = sorted(self.symbols())
+        index = {name: i for i, name in enumerate(symbols)}
+        try:
+            code = compile(f"lambda m: {self.source(index)}",
+                           "<sentence>", "eval")
+            return eval(code)
+        except (SyntaxError, RecursionError, MemoryError):
+            # Too deeply nested for the compiler; fall back to evaluate
+            return lambda m: self.evaluate(dict(zip(symbols, m)))
+
+    def source(self, index):
+        """Returns a Python expression for the sentence over the list m."""
+        raise Exception("nothing to compile")
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +139,14 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
+    precedence = 6
 
-    def __init__(self, name):
-        self.name = name
+    def __new__(cls, name):
+        return cls._intern((name,), ("symbol", name), {name}, name=name)
 
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
-
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def __reduce__(self):
+        return (Symbol, (self.name,))
 
     def __repr__(self):
         return self.name
@@ -60,25 +155,37 @@ class Symbol(Sentence):
         try:
             return bool(model[self.name])
         except KeyError:
-            raise Exception(f"variable {self.name} not in model")
+            raise EvaluationException(f"variable {self.name} not in model")
 
-    def formula(self):
-        return self.name
+    def render(self, parts, bound):
+        # Names with spaces or operators would read as part of the
+        # formula around them, so operands bracket them
+        if bound > 0 and not self.name.isidentifier():
+            parts.extend(("(", self.name, ")"))
+        else:
+            parts.append(self.name)
 
-    def symbols(self):
-        return {self.name}
+    def write(self, parts):
+        parts.append(self.name)
+
+    def source(self, index):
+        try:
+            return f"m[{index[self.name]}]"
+        except KeyError:
+            raise EvaluationException(f"variable {self.name} not in model")
 
 
 class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
+    __slots__ = ("operand",)
+    precedence = 5
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+    def __new__(cls, operand):
+        Sentence.validate(operand)
+        return cls._intern((operand,), ("not", hash(operand)),
+                           operand.symbols(), operand=operand)
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+    def __reduce__(self):
+        return (Not, (self.operand,))
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,27 +193,31 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
-    def formula(self):
-        return "¬" + Sentence.parenthesize(self.operand.formula())
+    def write(self, parts):
+        parts.append("¬")
+        self.operand.render(parts, Not.precedence - 1)
 
-    def symbols(self):
-        return self.operand.symbols()
+    def source(self, index):
+        return f"(not {self.operand.source(index)})"
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+    __slots__ = ("conjuncts",)
+    precedence = 4
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
-
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+        return cls._intern(
+            conjuncts,
+            ("and", tuple(hash(conjunct) for conjunct in conjuncts)),
+            frozenset().union(*[conjunct.symbols() for conjunct in conjuncts]),
+            conjuncts=conjuncts
         )
 
+    def __reduce__(self):
+        return (And, self.conjuncts)
+
     def __repr__(self):
         conjunctions = ", ".join(
             [str(conjunct) for conjunct in self.conjuncts]
@@ -114,36 +225,53 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        raise TypeError(
+            "logical sentences are immutable; use And(*knowledge.conjuncts, "
+            "conjunct) or KnowledgeBase.add"
+        )
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
-    def formula(self):
+    def render(self, parts, bound):
         if len(self.conjuncts) == 1:
-            return self.conjuncts[0].formula()
-        return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
-                           for conjunct in self.conjuncts])
+            self.conjuncts[0].render(parts, bound)
+        elif not self.conjuncts:
+            parts.append("⊤")
+        else:
+            Sentence.render(self, parts, bound)
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def write(self, parts):
+        for i, conjunct in enumerate(self.conjuncts):
+            if i > 0:
+                parts.append(" ∧ ")
+            conjunct.render(parts, And.precedence)
+
+    def source(self, index):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(
+            [conjunct.source(index) for conjunct in self.conjuncts]
+        ) + ")"
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    __slots__ = ("disjuncts",)
+    precedence = 3
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
-
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
+        return cls._intern(
+            disjuncts,
+            ("or", tuple(hash(disjunct) for disjunct in disjuncts)),
+            frozenset().union(*[disjunct.symbols() for disjunct in disjuncts]),
+            disjuncts=disjuncts
         )
 
+    def __reduce__(self):
+        return (Or, self.disjuncts)
+
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
         return f"Or({disjuncts})"
@@ -151,30 +279,44 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
-    def formula(self):
+    def render(self, parts, bound):
         if len(self.disjuncts) == 1:
-            return self.disjuncts[0].formula()
-        return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
-                            for disjunct in self.disjuncts])
+            self.disjuncts[0].render(parts, bound)
+        elif not self.disjuncts:
+            parts.append("⊥")
+        else:
+            Sentence.render(self, parts, bound)
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def write(self, parts):
+        for i, disjunct in enumerate(self.disjuncts):
+            if i > 0:
+                parts.append(" ∨ ")
+            disjunct.render(parts, Or.precedence)
+
+    def source(self, index):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(
+            [disjunct.source(index) for disjunct in self.disjuncts]
+        ) + ")"
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent")
+    precedence = 2
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+        return cls._intern(
+            (antecedent, consequent),
+            ("implies", hash(antecedent), hash(consequent)),
+            antecedent.symbols() | consequent.symbols(),
+            antecedent=antecedent, consequent=consequent
+        )
 
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
-
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+    def __reduce__(self):
+        return (Implication, (self.antecedent, self.consequent))
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +325,33 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
-    def formula(self):
-        antecedent = Sentence.parenthesize(self.antecedent.formula())
-        consequent = Sentence.parenthesize(self.consequent.formula())
-        return f"{antecedent} => {consequent}"
+    def write(self, parts):
+        self.antecedent.render(parts, Implication.precedence)
+        parts.append(" => ")
+        self.consequent.render(parts, Implication.precedence)
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def source(self, index):
+        antecedent = self.antecedent.source(index)
+        consequent = self.consequent.source(index)
+        return f"((not {antecedent}) or {consequent})"
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right")
+    precedence = 1
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
-
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return cls._intern(
+            (left, right),
+            ("biconditional", hash(left), hash(right)),
+            left.symbols() | right.symbols(),
+            left=left, right=right
+        )
 
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+    def __reduce__(self):
+        return (Biconditional, (self.left, self.right))
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,48 +362,1040 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
-    def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
-        return f"{left} <=> {right}"
-
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+    def write(self, parts):
+        self.left.render(parts, Biconditional.precedence)
+        parts.append(" <=> ")
+        self.right.render(parts, Biconditional.precedence)
+
+    def source(self, index):
+        left = self.left.source(index)
+        right = self.right.source(index)
+        return f"({left} == {right})"
+
+
+# Operators, and the ASCII spellings parse also accepts
+OPERATORS = {
+    "¬": "¬", "~": "¬",
+    "∧": "∧", "&": "∧",
+    "∨": "∨", "|": "∨",
+    "=>": "=>", "->": "=>",
+    "<=>": "<=>", "<->": "<=>",
+    "(": "(", ")": ")",
+    "⊤": "⊤", "⊥": "⊥"
+}
+TOKENS = re.compile(
+    r"\s*(<=>|<->|=>|->|[¬~∧&∨|()⊤⊥]|(?:(?!<=>|<->|=>|->)[^¬~∧&∨|()⊤⊥])+)"
+)
+
+
+def parse(text):
+    """
+    Parses a formula, as written by Sentence.formula, into a sentence.
+
+    Symbol names are the text between operators, with surrounding
+    whitespace removed. ¬ binds tightest, then ∧, ∨, => (which groups to
+    the right) and <=>.
+    """
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKENS.match(text, position)
+        if match is None:
+            raise ParseException(f"unexpected {text[position:]!r}")
+        tokens.append(OPERATORS.get(match.group(1), match.group(1).strip()))
+        position = match.end()
+    tokens.append(None)
+    position = 0
+
+    def peek():
+        return tokens[position]
+
+    def describe(token):
+        return "end of formula" if token is None else repr(token)
+
+    def expect(token):
+        nonlocal position
+        if tokens[position] != token:
+            raise ParseException(
+                f"expected {describe(token)}, found {describe(peek())}"
+            )
+        position += 1
+
+    def biconditional():
+        sentence = implication()
+        while peek() == "<=>":
+            expect("<=>")
+            sentence = Biconditional(sentence, implication())
+        return sentence
+
+    def implication():
+        sentence = disjunction()
+        if peek() == "=>":
+            expect("=>")
+            sentence = Implication(sentence, implication())
+        return sentence
+
+    def disjunction():
+        disjuncts = [conjunction()]
+        while peek() == "∨":
+            expect("∨")
+            disjuncts.append(conjunction())
+        return disjuncts[0] if len(disjuncts) == 1 else Or(*disjuncts)
+
+    def conjunction():
+        conjuncts = [unary()]
+        while peek() == "∧":
+            expect("∧")
+            conjuncts.append(unary())
+        return conjuncts[0] if len(conjuncts) == 1 else And(*conjuncts)
+
+    def unary():
+        nonlocal position
+        token = peek()
+        if token == "¬":
+            expect("¬")
+            return Not(unary())
+        elif token == "(":
+            expect("(")
+            sentence = biconditional()
+            expect(")")
+            return sentence
+        elif token == "⊤":
+            expect("⊤")
+            return And()
+        elif token == "⊥":
+            expect("⊥")
+            return Or()
+        elif token is None or token in OPERATORS.values():
+            raise ParseException(f"expected a symbol, found {describe(token)}")
+        position += 1
+        return Symbol(token)
+
+    sentence = biconditional()
+    expect(None)
+    return sentence
+
+
+def load_knowledge(filename):
+    """
+    Loads a knowledge base from a file with one formula per line,
+    skipping blank lines and lines starting with #.
+    """
+    sentences = []
+    with open(filename, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                sentences.append(parse(line))
+    return And(*sentences)
+
+
+class KnowledgeBase():
+    """
+    Knowledge base that keeps every model in which it is true, pruning
+    them as sentences are added, so queries only look at those models.
+    """
+
+    def __init__(self, *sentences):
+        self.sentences = []
+        self.symbols = []
+        self.models = [()]
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """Adds a sentence, discarding the models in which it is false."""
+        Sentence.validate(sentence)
+        new = sorted(sentence.symbols() - set(self.symbols))
+        self.sentences.append(sentence)
+        self.symbols.extend(new)
+        evaluate = sentence.compile(self.symbols)
+        self.models = [
+            model for model in self.extend(self.models, len(new))
+            if evaluate(model)
+        ]
+
+    def ask(self, query):
+        """Returns ENTAILED, CONTRADICTED or UNKNOWN for query."""
+        return self.ask_all([query])[0]
+
+    def ask_all(self, queries):
+        """Returns ENTAILED, CONTRADICTED or UNKNOWN for each query."""
+        queries = list(queries)
+        known = set(self.symbols)
+        new = sorted(set().union(
+            *[query.symbols() for query in queries]
+        ) - known)
+        symbols = self.symbols + new
+        return classify(
+            self.extend(self.models, len(new)),
+            [query.compile(symbols) for query in queries]
+        )
 
-        # If model has an assignment for each symbol
-        if not symbols:
+    def entails(self, query):
+        """Checks if knowledge base entails query."""
+        return self.ask(query) == ENTAILED
+
+    def satisfiable(self):
+        """Checks if knowledge base is true in some model."""
+        return len(self.models) > 0
+
+    def sentence(self):
+        """Returns the conjunction of every sentence added."""
+        return And(*self.sentences)
+
+    @staticmethod
+    def extend(models, count):
+        """Yields every model extended with values for count new symbols."""
+        if count == 0:
+            yield from models
+            return
+        values = list(itertools.product((True, False), repeat=count))
+        for model in models:
+            for extra in values:
+                yield model + extra
+
+
+class CNF():
+    """
+    Clauses in conjunctive normal form over integer literals.
+
+    Symbols are numbered from 1 in the order they are seen; a literal is
+    a symbol's number, negated when the symbol is false. Variables
+    introduced by the Tseitin encoding have no name.
+    """
+
+    def __init__(self):
+        self.variables = dict()
+        self.names = [None]
+        self.clauses = []
+        self.definitions = dict()
+
+    def variable(self, name):
+        """Returns the number of a symbol, numbering it if it is new."""
+        if name not in self.variables:
+            self.variables[name] = len(self.names)
+            self.names.append(name)
+        return self.variables[name]
+
+    def fresh(self):
+        """Returns the number of a new, unnamed variable."""
+        self.names.append(None)
+        return len(self.names) - 1
+
+    # Most clauses a conjunct may expand to before tseitin names it
+    limit = 64
+
+    def add(self, sentence, tseitin=False):
+        """
+        Adds the clauses of a sentence to the clause set.
+
+        By default the clauses are equivalent to the sentence, which can
+        take exponentially many clauses. With tseitin, each conjunct that
+        would expand to more than limit clauses is instead named by fresh
+        variables, one per subformula, so the clause set grows linearly
+        and is satisfiable exactly when the sentence is.
+        """
+        Sentence.validate(sentence)
+        if isinstance(sentence, And) and tseitin:
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct, tseitin=True)
+        elif tseitin and CNF.size(sentence, True, dict()) > CNF.limit:
+            self.clauses.append([self.define(sentence)])
+        else:
+            for clause in self.convert(sentence, True):
+                self.clauses.append(sorted(clause, key=abs))
+
+    def define(self, sentence):
+        """
+        Returns a literal equivalent to the sentence, adding clauses that
+        define a fresh variable for each connective not seen before.
+        """
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        elif isinstance(sentence, Not):
+            return -self.define(sentence.operand)
+        if sentence in self.definitions:
+            return self.definitions[sentence]
+
+        if isinstance(sentence, And):
+            literal = -self.define_or([-self.define(conjunct)
+                                       for conjunct in sentence.conjuncts])
+        elif isinstance(sentence, Or):
+            literal = self.define_or([self.define(disjunct)
+                                      for disjunct in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            literal = self.define_or([-self.define(sentence.antecedent),
+                                      self.define(sentence.consequent)])
+        elif isinstance(sentence, Biconditional):
+            left = self.define(sentence.left)
+            right = self.define(sentence.right)
+            literal = self.fresh()
+            self.clauses.extend([
+                [-literal, -left, right], [-literal, left, -right],
+                [literal, left, right], [literal, -left, -right]
+            ])
+        else:
+            raise TypeError("must be a logical sentence")
+        self.definitions[sentence] = literal
+        return literal
+
+    def define_or(self, literals):
+        """Returns a fresh variable defined as the disjunction of literals."""
+        if len(literals) == 1:
+            return literals[0]
+        variable = self.fresh()
+        self.clauses.append([-variable] + literals)
+        for literal in literals:
+            self.clauses.append([variable, -literal])
+        return variable
+
+    def convert(self, sentence, positive):
+        """
+        Returns a list of clauses (frozensets of literals) equivalent to
+        the sentence, or to its negation if positive is False.
+        """
+        if isinstance(sentence, Symbol):
+            variable = self.variable(sentence.name)
+            return [frozenset([variable if positive else -variable])]
+        elif isinstance(sentence, Not):
+            return self.convert(sentence.operand, not positive)
+        elif isinstance(sentence, And):
+            parts = [self.convert(conjunct, positive)
+                     for conjunct in sentence.conjuncts]
+            return CNF.conjoin(parts) if positive else CNF.distribute(parts)
+        elif isinstance(sentence, Or):
+            parts = [self.convert(disjunct, positive)
+                     for disjunct in sentence.disjuncts]
+            return CNF.distribute(parts) if positive else CNF.conjoin(parts)
+        elif isinstance(sentence, Implication):
+            if positive:
+                return CNF.distribute([
+                    self.convert(sentence.antecedent, False),
+                    self.convert(sentence.consequent, True)
+                ])
+            return (self.convert(sentence.antecedent, True)
+                    + self.convert(sentence.consequent, False))
+        elif isinstance(sentence, Biconditional):
+            left_true = self.convert(sentence.left, True)
+            left_false = self.convert(sentence.left, False)
+            right_true = self.convert(sentence.right, True)
+            right_false = self.convert(sentence.right, False)
+            if positive:
+                return (CNF.distribute([left_false, right_true])
+                        + CNF.distribute([left_true, right_false]))
+            return (CNF.distribute([left_true, right_true])
+                    + CNF.distribute([left_false, right_false]))
+        raise TypeError("must be a logical sentence")
+
+    @staticmethod
+    def size(sentence, positive, sizes):
+        """
+        Returns how many clauses convert produces for the sentence (or its
+        negation), ignoring tautologies, memoized in sizes.
+        """
+        if isinstance(sentence, Symbol):
+            return 1
+        elif isinstance(sentence, Not):
+            return CNF.size(sentence.operand, not positive, sizes)
+        if (sentence, positive) in sizes:
+            return sizes[(sentence, positive)]
+
+        if isinstance(sentence, (And, Or)):
+            parts = [CNF.size(child, positive, sizes) for child in (
+                sentence.conjuncts if isinstance(sentence, And)
+                else sentence.disjuncts
+            )]
+            if isinstance(sentence, And) == positive:
+                size = sum(parts)
+            else:
+                size = math.prod(parts)
+        elif isinstance(sentence, Implication):
+            antecedent = CNF.size(sentence.antecedent, not positive, sizes)
+            consequent = CNF.size(sentence.consequent, positive, sizes)
+            if positive:
+                size = antecedent * consequent
+            else:
+                size = antecedent + consequent
+        elif isinstance(sentence, Biconditional):
+            left_true = CNF.size(sentence.left, True, sizes)
+            left_false = CNF.size(sentence.left, False, sizes)
+            right_true = CNF.size(sentence.right, True, sizes)
+            right_false = CNF.size(sentence.right, False, sizes)
+            if positive:
+                size = left_false * right_true + left_true * right_false
+            else:
+                size = left_true * right_true + left_false * right_false
+        else:
+            raise TypeError("must be a logical sentence")
+        sizes[(sentence, positive)] = size
+        return size
+
+    @staticmethod
+    def conjoin(parts):
+        """Returns the clauses of a conjunction of clause lists."""
+        return [clause for part in parts for clause in part]
+
+    @staticmethod
+    def distribute(parts):
+        """Returns the clauses of a disjunction of clause lists."""
+        clauses = [frozenset()]
+        for part in parts:
+            clauses = [
+                clause | other
+                for clause in clauses
+                for other in part
+                if not any(-literal in clause for literal in other)
+            ]
+        return clauses
+
+
+class Solver():
+    """
+    CDCL satisfiability solver.
+
+    Clauses are lists of integer literals.  Unit propagation uses two
+    watched literals per clause (always the first two), conflicts are
+    analysed to the first unique implication point and the learned
+    clause is kept, and branching follows variable activity, the most
+    active unassigned variable being kept at the top of a heap.
+    """
+
+    def __init__(self):
+        self.num_vars = 0
+        self.clauses = []
+        self.learned = []
+        self.watches = dict()
+        self.values = dict()
+        self.level = dict()
+        self.reason = dict()
+        self.activity = dict()
+        self.phase = dict()
+
+        # Entries (-activity, variable), including stale ones for
+        # variables since assigned or bumped, which are skipped
+        self.order = []
+        self.trail = []
+        self.trail_lim = []
+        self.head = 0
+        self.increment = 1.0
+        self.unsat = False
+        self.decisions = 0
+        self.conflicts = 0
+        self.propagations = 0
+
+    def new_variable(self, variable):
+        """Ensures variables up to the given number exist."""
+        while self.num_vars < variable:
+            self.num_vars += 1
+            self.watches[self.num_vars] = []
+            self.watches[-self.num_vars] = []
+            self.activity[self.num_vars] = 0.0
+            heapq.heappush(self.order, (-0.0, self.num_vars))
+
+    def add_clause(self, literals):
+        """Adds a clause; returns False if the clause set became unsatisfiable."""
+        if self.unsat:
+            return False
+        self._backtrack(0)
+        clause = []
+        for literal in literals:
+            self.new_variable(abs(literal))
+            value = self.values.get(literal)
+            if value is True or -literal in clause:
+                return True
+            if value is None and literal not in clause:
+                clause.append(literal)
+        if not clause:
+            self.unsat = True
+        elif len(clause) == 1:
+            self._assign(clause[0], None)
+            if self._propagate() is not None:
+                self.unsat = True
+        else:
+            self.clauses.append(clause)
+            self.watches[clause[0]].append(clause)
+            self.watches[clause[1]].append(clause)
+        return not self.unsat
+
+    def solve(self, assumptions=()):
+        """
+        Returns a satisfying model as a dict from variable to bool,
+        or None if the clauses and assumptions are unsatisfiable.
+        """
+        if self.unsat:
+            return None
+        for assumption in assumptions:
+            self.new_variable(abs(assumption))
+        self._backtrack(0)
+        restart = 100
+        since_restart = 0
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                since_restart += 1
+                if not self.trail_lim:
+                    self.unsat = True
+                    return None
+                learned, level = self._analyze(conflict)
+                self._backtrack(level)
+                if len(learned) > 1:
+                    self.learned.append(learned)
+                    self.watches[learned[0]].append(learned)
+                    self.watches[learned[1]].append(learned)
+                self._assign(learned[0], learned)
+                self._decay()
+                continue
+
+            # Restart with geometrically growing intervals
+            if since_restart >= restart:
+                since_restart = 0
+                restart = int(restart * 1.5)
+                self._backtrack(0)
+                continue
+
+            # Decide the next assumption, or else the most active variable
+            literal = None
+            while len(self.trail_lim) < len(assumptions):
+                assumption = assumptions[len(self.trail_lim)]
+                value = self.values.get(assumption)
+                if value is None:
+                    literal = assumption
+                    break
+                elif value is False:
+                    self._backtrack(0)
+                    return None
+                self.trail_lim.append(len(self.trail))
+            if literal is None:
+                variable = self._pick_branch()
+                if variable is None:
+                    model = {variable: self.values[variable]
+                             for variable in range(1, self.num_vars + 1)}
+                    self._backtrack(0)
+                    return model
+                literal = variable if self.phase.get(variable) else -variable
+            self.decisions += 1
+            self.trail_lim.append(len(self.trail))
+            self._assign(literal, None)
+
+    def _assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[literal] = True
+        self.values[-literal] = False
+        self.level[variable] = len(self.trail_lim)
+        self.reason[variable] = reason
+        self.trail.append(literal)
+
+    def _backtrack(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            del self.values[literal]
+            del self.values[-literal]
+            self.phase[variable] = literal > 0
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.head = len(self.trail)
+        if len(self.order) > 4 * self.num_vars:
+            self._reorder()
+
+    def _propagate(self):
+        """Propagates unit clauses; returns a conflicting clause or None."""
+        values = self.values
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            self.propagations += 1
+            watchers = self.watches[false_literal]
+            kept = []
+            conflict = None
+            for clause in watchers:
+                if conflict is not None:
+                    kept.append(clause)
+                    continue
+
+                # Keep the falsified literal in the second position
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                first = clause[0]
+                if values.get(first) is True:
+                    kept.append(clause)
+                    continue
+
+                # Look for a new literal to watch
+                for k in range(2, len(clause)):
+                    if values.get(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], false_literal
+                        self.watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if values.get(first) is False:
+                        conflict = clause
+                    else:
+                        self._assign(first, clause)
+            self.watches[false_literal] = kept
+            if conflict is not None:
+                return conflict
+        return None
+
+    def _analyze(self, conflict):
+        """Returns a learned clause and the level to backjump to."""
+        level = len(self.trail_lim)
+        learned = [None]
+        seen = set()
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for other in clause:
+                variable = abs(other)
+                if other == literal or variable in seen:
+                    continue
+                if self.level[variable] > 0:
+                    seen.add(variable)
+                    self.activity[variable] += self.increment
+                    if self.level[variable] == level:
+                        pending += 1
+                    else:
+                        learned.append(other)
+
+            # Walk back along the trail to the next literal to resolve on
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reason[abs(literal)]
+        learned[0] = -literal
+
+        # Backjump to the second highest level in the learned clause
+        if len(learned) == 1:
+            return learned, 0
+        highest = max(range(1, len(learned)),
+                      key=lambda i: self.level[abs(learned[i])])
+        learned[1], learned[highest] = learned[highest], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def _decay(self):
+        """Favours recent conflicts by growing the activity increment."""
+        self.increment *= 1.05
+        if self.increment > 1e100:
+            for variable in self.activity:
+                self.activity[variable] *= 1e-100
+            self.increment *= 1e-100
+            self._reorder()
+
+    def _reorder(self):
+        """Rebuilds the heap from the unassigned variables alone."""
+        self.order = [(-self.activity[variable], variable)
+                      for variable in range(1, self.num_vars + 1)
+                      if self.values.get(variable) is None]
+        heapq.heapify(self.order)
+
+    def _pick_branch(self):
+        """Returns the most active unassigned variable, or None."""
+        order = self.order
+        while order:
+            activity, variable = heapq.heappop(order)
+            if (self.values.get(variable) is None
+                    and -activity == self.activity[variable]):
+                return variable
+        return None
+
+
+def model_check(knowledge, query, backend="cdcl", stats=None):
+    """Checks if knowledge base entails query.
+
+    backend selects the inference procedure: "cdcl" refutes
+    knowledge ∧ ¬query with a SAT solver, "enumerate" checks every model,
+    "vectorized" checks every model at once with NumPy, "parallel"
+    splits the models across worker processes and "resolution" refutes
+    knowledge ∧ ¬query by resolution. If stats is a dict, the backend
+    adds counts of the work it did to it.
+    """
+    if backend == "cdcl":
+        return model_check_sat(knowledge, query, stats=stats)
+    elif backend == "enumerate":
+        return model_check_enumerate(knowledge, query, stats=stats)
+    elif backend == "vectorized":
+        return model_check_vectorized(knowledge, query, stats=stats)
+    elif backend == "parallel":
+        return model_check_parallel(knowledge, query, stats=stats)
+    elif backend == "resolution":
+        return model_check_resolution(knowledge, query, stats=stats)
+    raise ValueError(f"unknown backend {backend}")
+
+
+def record(stats, **counts):
+    """Adds counts of work done to stats, if there is a stats dict."""
+    if stats is not None:
+        for key, value in counts.items():
+            stats[key] = stats.get(key, 0) + value
+
+
+def model_check_enumerate(knowledge, query, stats=None):
+    """Checks if knowledge base entails query by enumerating all models."""
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
+    # Get all symbols in both knowledge and query
+    symbols = sorted(knowledge.symbols() | query.symbols())
+
+    # Compile both sentences over the same symbol order
+    knowledge = knowledge.compile(symbols)
+    query = query.compile(symbols)
+
+    # In every model where knowledge base is true, query must also be true
+    entailed = True
+    count = 0
+    for model in itertools.product((True, False), repeat=len(symbols)):
+        count += 1
+        if knowledge(model) and not query(model):
+            entailed = False
+            break
+    record(stats, models=count)
+    return entailed
+
+
+def model_check_parallel(knowledge, query, workers=None, split=None,
+                         stats=None):
+    """
+    Checks if knowledge base entails query by enumerating models in
+    worker processes. The values of the first split symbols fix a subtree
+    of models per task; as soon as any task finds a model where knowledge
+    base is true and query is false, the remaining tasks are cancelled.
+
+    Scripts that call this must guard their top-level code with
+    if __name__ == "__main__" on platforms that spawn workers.
+    """
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if split is None:
+        split = math.ceil(math.log2(4 * workers))
+    split = min(split, len(symbols))
+
+    context = multiprocessing.get_context()
+    found = context.Event()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=start_worker,
+        initargs=(knowledge, query, symbols, found)
+    ) as executor:
+        tasks = [
+            executor.submit(check_subtree, prefix)
+            for prefix in itertools.product((True, False), repeat=split)
+        ]
+        for task in concurrent.futures.as_completed(tasks):
+            entailed, count = task.result()
+            record(stats, models=count, tasks=1)
+            if not entailed:
+                found.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+                return False
+    return True
+
+
+# State of a model_check_parallel worker process
+worker_state = dict()
+
+
+def start_worker(knowledge, query, symbols, found):
+    """Compiles the sentences once per worker process."""
+    worker_state["knowledge"] = knowledge.compile(symbols)
+    worker_state["query"] = query.compile(symbols)
+    worker_state["size"] = len(symbols)
+    worker_state["found"] = found
+
+
+def check_subtree(prefix):
+    """
+    Checks entailment in every model that starts with prefix. Returns
+    whether it holds and how many models were checked.
+    """
+    knowledge, query = worker_state["knowledge"], worker_state["query"]
+    found = worker_state["found"]
+    remaining = worker_state["size"] - len(prefix)
+    for i, rest in enumerate(
+        itertools.product((True, False), repeat=remaining)
+    ):
+
+        # Give up if another worker already found a counter-model
+        if i % 4096 == 0 and found.is_set():
+            return True, i
+        model = prefix + rest
+        if knowledge(model) and not query(model):
+            return False, i + 1
+    return True, 2 ** remaining
+
+
+def model_check_batch(knowledge, queries):
+    """
+    Checks many queries against one knowledge base in a single pass over
+    its models. Returns a list with, for each query, ENTAILED if knowledge
+    base entails it, CONTRADICTED if it entails its negation, and UNKNOWN
+    otherwise.
+    """
+    queries = list(queries)
+
+    # Get all symbols in knowledge and every query
+    symbols = sorted(knowledge.symbols().union(
+        *[query.symbols() for query in queries]
+    ))
+    knowledge = knowledge.compile(symbols)
+    models = (
+        model
+        for model in itertools.product((True, False), repeat=len(symbols))
+        if knowledge(model)
+    )
+    return classify(models, [query.compile(symbols) for query in queries])
+
+
+def classify(models, queries):
+    """
+    Returns ENTAILED, CONTRADICTED or UNKNOWN for each compiled query,
+    given every model in which the knowledge base is true.
+    """
+
+    # Track whether each query is true or false in some model
+    true_somewhere = [False] * len(queries)
+    false_somewhere = [False] * len(queries)
+    undecided = list(range(len(queries)))
+    for model in models:
+
+        # Stop once every query is known to be UNKNOWN
+        if not undecided:
+            break
+        remaining = []
+        for i in undecided:
+            if queries[i](model):
+                true_somewhere[i] = True
+            else:
+                false_somewhere[i] = True
+            if not (true_somewhere[i] and false_somewhere[i]):
+                remaining.append(i)
+        undecided = remaining
+
+    results = []
+    for i in range(len(queries)):
+        if not false_somewhere[i]:
+            results.append(ENTAILED)
+        elif not true_somewhere[i]:
+            results.append(CONTRADICTED)
         else:
+            results.append(UNKNOWN)
+    return results
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
+def model_check_vectorized(knowledge, query, chunk_bits=20, stats=None):
+    """
+    Checks if knowledge base entails query by evaluating it in every model
+    at once: each symbol is a bit-vector with one bit per model, and the
+    connectives are bitwise operations over whole vectors.
 
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
+    Models are checked in chunks of 2 ** chunk_bits to bound memory.
+    """
+    import numpy as np
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+    # Truth values of the first six symbols within a 64-bit word
+    patterns = (0xAAAAAAAAAAAAAAAA, 0xCCCCCCCCCCCCCCCC, 0xF0F0F0F0F0F0F0F0,
+                0xFF00FF00FF00FF00, 0xFFFF0000FFFF0000, 0xFFFFFFFF00000000)
+    ones = np.uint64(0xFFFFFFFFFFFFFFFF)
+    zeros = np.uint64(0)
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
-
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    low, high = symbols[:chunk_bits], symbols[chunk_bits:]
+
+    # Bit b of word w in a chunk is model 64 * w + b, in which symbol i
+    # is true if bit i of the model number is set
+    words = max(1, 2 ** len(low) // 64)
+    vectors = dict()
+    for i, name in enumerate(low):
+        if i < 6:
+            vectors[name] = np.full(words, patterns[i], dtype=np.uint64)
+        else:
+            blocks = (np.arange(words) >> (i - 6)) & 1
+            vectors[name] = np.where(blocks == 1, ones, zeros)
+    if len(low) < 6:
+        valid = np.uint64((1 << 2 ** len(low)) - 1)
+    else:
+        valid = ones
+
+    # Remaining symbols are constant within each chunk
+    for chunk in range(2 ** len(high)):
+        for i, name in enumerate(high):
+            vectors[name] = ones if (chunk >> i) & 1 else zeros
+        counter = (evaluate_vector(knowledge, vectors, ones)
+                   & ~evaluate_vector(query, vectors, ones) & valid)
+        record(stats, models=2 ** len(low))
+        if np.any(counter):
+            return False
+    return True
+
+
+def evaluate_vector(sentence, vectors, ones):
+    """Evaluates a sentence bitwise over bit-vectors of truth values."""
+    if isinstance(sentence, Symbol):
+        return vectors[sentence.name]
+    elif isinstance(sentence, Not):
+        return ~evaluate_vector(sentence.operand, vectors, ones)
+    elif isinstance(sentence, And):
+        result = ones
+        for conjunct in sentence.conjuncts:
+            result = result & evaluate_vector(conjunct, vectors, ones)
+        return result
+    elif isinstance(sentence, Or):
+        result = ~ones
+        for disjunct in sentence.disjuncts:
+            result = result | evaluate_vector(disjunct, vectors, ones)
+        return result
+    elif isinstance(sentence, Implication):
+        return (~evaluate_vector(sentence.antecedent, vectors, ones)
+                | evaluate_vector(sentence.consequent, vectors, ones))
+    elif isinstance(sentence, Biconditional):
+        return ~(evaluate_vector(sentence.left, vectors, ones)
+                 ^ evaluate_vector(sentence.right, vectors, ones))
+    raise TypeError("must be a logical sentence")
+
+
+def model_check_sat(knowledge, query, stats=None):
+    """Checks if knowledge base entails query by refuting knowledge ∧ ¬query."""
+    cnf = CNF()
+    cnf.add(knowledge, tseitin=True)
+    cnf.add(Not(query), tseitin=True)
+    return not satisfiable(cnf.clauses, stats=stats)
+
+
+def satisfiable(clauses, stats=None):
+    """Checks if some model satisfies every clause."""
+    solver = Solver()
+    result = all(solver.add_clause(clause) for clause in clauses) \
+        and solver.solve() is not None
+    record(stats, variables=solver.num_vars, clauses=len(clauses),
+           decisions=solver.decisions, conflicts=solver.conflicts,
+           propagations=solver.propagations)
+    return result
+
+
+def model_check_resolution(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query by deriving the empty clause
+    from the clauses of knowledge ∧ ¬query.
+
+    Resolution uses the set-of-support strategy: every resolvent has a
+    parent descended from ¬query, which is complete whenever knowledge
+    base is satisfiable. Showing that a query is not entailed means
+    saturating the clause set, which grows exponentially with the number
+    of symbols, so this suits small knowledge bases.
+    """
+    cnf = CNF()
+    cnf.add(knowledge, tseitin=True)
+    count = len(cnf.clauses)
+    cnf.add(Not(query), tseitin=True)
+    support = set(map(frozenset, cnf.clauses[count:]))
+    clauses = simplify(cnf.clauses)
+    usable = [clause for clause in clauses if clause not in support]
+    support = [clause for clause in clauses if clause in support]
+    if resolve(support, usable, stats=stats):
+        return True
+
+    # Set of support cannot refute an inconsistent knowledge base
+    return not satisfiable(cnf.clauses[:count], stats=stats)
+
+
+def simplify(clauses):
+    """
+    Returns an equisatisfiable list of clauses (frozensets of literals)
+    without tautologies, subsumed clauses or clauses with pure literals.
+    """
+    clauses = set(
+        frozenset(clause) for clause in clauses
+        if not any(-literal in clause for literal in clause)
+    )
+
+    # Drop clauses that contain a smaller clause
+    kept = []
+    occurrences = dict()
+    for clause in sorted(clauses, key=len):
+        candidates = set()
+        for literal in clause:
+            candidates.update(occurrences.get(literal, ()))
+        if any(kept[i] <= clause for i in candidates):
+            continue
+        for literal in clause:
+            occurrences.setdefault(literal, []).append(len(kept))
+        kept.append(clause)
+
+    # Repeatedly drop clauses with a literal whose negation never occurs
+    while True:
+        literals = set().union(*kept)
+        pure = {literal for literal in literals if -literal not in literals}
+        if not pure:
+            return kept
+        kept = [clause for clause in kept if not clause & pure]
+
+
+def resolve(support, usable, stats=None):
+    """
+    Checks if the empty clause follows by resolution from the clauses in
+    support and usable, resolving only on clauses descended from support.
+    Resolvents that contain a clause already kept are discarded.
+    """
+    if frozenset() in support or frozenset() in usable:
+        return True
+
+    # Every clause kept so far, indexed by literal
+    kept = dict()
+
+    def keep(clause):
+        for literal in clause:
+            kept.setdefault(literal, []).append(clause)
+
+    def subsumed(clause):
+        return any(other <= clause
+                   for literal in clause
+                   for other in kept.get(literal, ()))
+
+    # Clauses already resolved against, indexed by literal
+    index = dict()
+    for clause in usable:
+        keep(clause)
+        for literal in clause:
+            index.setdefault(literal, []).append(clause)
+
+    # Resolve shortest clauses first
+    queue = []
+    for clause in support:
+        keep(clause)
+        heapq.heappush(queue, (len(clause), len(queue), clause))
+    count = len(queue)
+    given = resolvents = 0
+    while queue:
+        _, _, clause = heapq.heappop(queue)
+        given += 1
+        for literal in clause:
+            for other in index.get(-literal, ()):
+                resolvent = (clause - {literal}) | (other - {-literal})
+                resolvents += 1
+                if not resolvent:
+                    record(stats, given=given, resolvents=resolvents)
+                    return True
+                if (any(-member in resolvent for member in resolvent)
+                        or subsumed(resolvent)):
+                    continue
+                keep(resolvent)
+                heapq.heappush(queue, (len(resolvent), count, resolvent))
+                count += 1
+        for literal in clause:
+            index.setdefault(literal, []).append(clause)
+    record(stats, given=given, resolvents=resolvents)
+    return False
@@ -90,8 +90,9 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
-            for symbol in symbols:
-                if model_check(knowledge, symbol):
+            statuses = model_check_batch(knowledge, symbols)
+            for symbol, status in zip(symbols, statuses):
+                if status == ENTAILED:
                     print(f"    {symbol}")
 
 
@@ -3,12 +3,45 @@ Tic Tac Toe Player
 """
 
 import math
-import copy
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Boards are also kept as two 9-bit masks of the cells of X and of O,
+# cell (i, j) being bit 3 * i + j
+FULL = (1 << 9) - 1
+
+# Masks of the rows, columns and diagonals that win
+WINS = [0b000000111, 0b000111000, 0b111000000, 0b001001001, 0b010010010,
+        0b100100100, 0b100010001, 0b001010100]
+
+# Whether each mask holds a winning line, and how many cells it holds
+WON = [any(mask & win == win for win in WINS) for mask in range(1 << 9)]
+COUNTS = [bin(mask).count("1") for mask in range(1 << 9)]
+
+# Cell k of the board under each of the 8 rotations and reflections
+SYMMETRIES = [(0, 1, 2, 3, 4, 5, 6, 7, 8), (6, 3, 0, 7, 4, 1, 8, 5, 2),
+              (8, 7, 6, 5, 4, 3, 2, 1, 0), (2, 5, 8, 1, 4, 7, 0, 3, 6),
+              (2, 1, 0, 5, 4, 3, 8, 7, 6), (0, 3, 6, 1, 4, 7, 2, 5, 8),
+              (6, 7, 8, 3, 4, 5, 0, 1, 2), (8, 5, 2, 7, 4, 1, 6, 3, 0)]
+
+# Each mask under each symmetry
+TRANSFORMS = [[sum(1 << k for k, cell in enumerate(symmetry)
+                   if mask >> cell & 1) for mask in range(1 << 9)]
+              for symmetry in SYMMETRIES]
+
+# Moves searched first are likelier to cut off the rest: the centre,
+# then the corners, then the edges
+ORDER = [1 << cell for cell in (4, 0, 2, 6, 8, 1, 3, 5, 7)]
+
+# Kinds of value kept in the transposition table
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Maps the smallest key of a board over its symmetries, which also
+# fixes whose turn it is, to (value, kind), shared by every search
+table = dict()
+
 
 def initial_state():
     """
@@ -23,67 +56,68 @@ def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    X_count, O_count = 0, 0
-    for h in board:
-        for cell in h:
-            X_count += (cell == X)
-            O_count += (cell == O)
-    return X if X_count == O_count else O
+    x, o = to_bits(board)
+    return X if COUNTS[x] == COUNTS[o] else O
+
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    actions = []
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == EMPTY:
-                actions.append((i, j))
-    return actions
+    x, o = to_bits(board)
+    return [divmod(cell, 3) for cell in range(9) if not (x | o) >> cell & 1]
+
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    new_board = copy.deepcopy(board)
-    fill = player(board)
-    i,j = action
-    if board[i][j] != EMPTY:
+    x, o = to_bits(board)
+    i, j = action
+    move = 1 << (3 * i + j)
+    if (x | o) & move:
         raise Exception("infeasible move")
-    new_board[i][j] = fill
-    return new_board
+    if COUNTS[x] == COUNTS[o]:
+        return from_bits(x | move, o)
+    return from_bits(x, o | move)
+
 
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    for i in range(3):
-        if (board[i][0] == board[i][1] == board[i][2]) and board[i][0] != EMPTY:
-            return board[i][0]
-        if (board[0][i] == board[1][i] == board[2][i]) and board[0][i] != EMPTY:
-            return board[0][i]
-    
-    if (board[0][0] == board[1][1] == board[2][2]) and board[0][0] != EMPTY:
-        return board[0][0]
-
-    if (board[0][2] == board[1][1] == board[2][0]) and board[0][2] != EMPTY:
-        return board[0][2] 
-
+    x, o = to_bits(board)
+    if WON[x]:
+        return X
+    if WON[o]:
+        return O
     return None
 
+
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    if winner(board) != None:
-        return True
-    
-    for h in board:
-        for cell in h:
-            if cell == EMPTY:
-                return False 
-    
-    return True
+    x, o = to_bits(board)
+    return WON[x] or WON[o] or x | o == FULL
+
+
+def to_bits(board):
+    """Returns the masks (x, o) of the cells of X and of O on a board."""
+    x, o = 0, 0
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == X:
+                x |= 1 << (3 * i + j)
+            elif cell == O:
+                o |= 1 << (3 * i + j)
+    return (x, o)
+
+
+def from_bits(x, o):
+    """Returns the board with X on the cells of mask x and O on those of o."""
+    return [[X if x >> (3 * i + j) & 1 else O if o >> (3 * i + j) & 1
+             else EMPTY for j in range(3)] for i in range(3)]
 
 
 def utility(board):
@@ -99,58 +133,91 @@ def utility(board):
         return 0
 
 
-def argmax(v):
-    ix = 0
-    maxV = v[0]
-    for i,x in enumerate(v):
-        if x > maxV:
-            ix, maxV = i, x
-    return ix
-
-def argmin(v):
-    ix = 0
-    minV = v[0]
-    for i,x in enumerate(v):
-        if x < minV:
-            ix, minV = i, x
-    return ix
-    
-def min_value(board):
-    if terminal(board):
-        return utility(board)
-    v = 10
-    for action in actions(board):
-        v = min(v, max_value(result(board, action)))
-    return v
+def value(board):
+    """
+    Returns the value of the board under optimal play: 1 if X wins, -1
+    if O wins, 0 for a draw.
+    """
+    x, o = to_bits(board)
+    return search(x, o, COUNTS[x] == COUNTS[o], -math.inf, math.inf)
+
+
+# Whose turn it is follows from the board, so both sides share value
+min_value = max_value = value
+
 
-def max_value(board):
-    if terminal(board):
-        return utility(board)
-    v = -10
-    for action in actions(board):
-        v = max(v, min_value(result(board, action)))
-    return v
-    
 def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     X : Max
     O : Min
+
+    Of equally good actions, returns the first in the order of actions.
     """
     if terminal(board):
         return None
 
-    Actions = actions(board)
-    turn = player(board)
-    v = []
-    if turn == X: # Max
-        for action in Actions:
-            v.append(min_value(result(board, action)))
-        return Actions[argmax(v)]
-    elif turn == O: # Min
-        for action in Actions:
-            v.append(max_value(result(board, action)))
-        return Actions[argmin(v)]
-    
-
-        
+    x, o = to_bits(board)
+    x_turn = COUNTS[x] == COUNTS[o]
+    best_action, best = None, -math.inf
+    for action in actions(board):
+        move = 1 << (3 * action[0] + action[1])
+
+        # Only whether an action beats the best so far matters
+        if x_turn:
+            value = search(x | move, o, False, best, 1)
+        else:
+            value = -search(x, o | move, True, -1, -best)
+        if best_action is None or value > best:
+            best_action, best = action, value
+            if best == 1:
+                break
+    return best_action
+
+
+def search(x, o, x_turn, alpha, beta):
+    """
+    Returns the value of the board with masks x and o, X to move if
+    x_turn, searched with alpha-beta pruning: exact if it lies between
+    alpha and beta, else a bound on the same side of them.
+    """
+    key = min((transform[x] << 9) | transform[o] for transform in TRANSFORMS)
+    entry = table.get(key)
+    if entry is not None:
+        value, kind = entry
+        if (kind == EXACT or (kind == LOWER and value >= beta)
+                or (kind == UPPER and value <= alpha)):
+            return value
+
+    if WON[x] or WON[o]:
+        value = 1 if WON[x] else -1
+        table[key] = (value, EXACT)
+        return value
+    empty = FULL & ~(x | o)
+    if not empty:
+        table[key] = (0, EXACT)
+        return 0
+
+    low, high = alpha, beta
+    best = -math.inf if x_turn else math.inf
+    for move in ORDER:
+        if not empty & move:
+            continue
+        if x_turn:
+            value = search(x | move, o, False, alpha, beta)
+            best = max(best, value)
+            alpha = max(alpha, value)
+        else:
+            value = search(x, o | move, True, alpha, beta)
+            best = min(best, value)
+            beta = min(beta, value)
+        if alpha >= beta:
+            break
+
+    if best <= low:
+        table[key] = (best, UPPER)
+    elif best >= high:
+        table[key] = (best, LOWER)
+    else:
+        table[key] = (best, EXACT)
+    return best
@@ -0,0 +1,158 @@
+"""
+Benchmarks the inference backends of logic.py on the puzzle knowledge
+bases and on random 3-SAT knowledge bases of increasing size, and writes
+the timings and work counts to a JSON report: to the file given, or else
+to standard output, progress going to standard error.
+
+Usage: python benchmark.py [report.json]
+"""
+
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from logic import *
+
+import clue
+import harry
+import mastermind
+import puzzle
+
+BACKENDS = ["cdcl", "enumerate", "vectorized", "parallel", "resolution",
+            "batch"]
+
+# Most symbols each backend is run on; larger knowledge bases are skipped
+LIMITS = {
+    "cdcl": None,
+    "enumerate": 20,
+    "vectorized": 28,
+    "parallel": 24,
+    "resolution": 12,
+    "batch": 20
+}
+
+# Symbols in the random 3-SAT knowledge bases
+RANDOM_SIZES = [10, 15, 20, 25, 50, 100, 200]
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python benchmark.py [report.json]")
+    filename = sys.argv[1] if len(sys.argv) == 2 else None
+
+    results = []
+    for name, knowledge, queries in workloads():
+        size = len(knowledge.symbols())
+        answers = dict()
+        for backend in BACKENDS:
+            limit = LIMITS[backend]
+            if limit is not None and size > limit:
+                continue
+            try:
+                result = run(knowledge, queries, backend)
+            except ImportError as e:
+                print(f"{name:<12} {size:>5} {backend:<11} skipped: {e}",
+                      file=sys.stderr)
+                continue
+            result.update(workload=name, symbols=size)
+            answers[backend] = result["answers"]
+            results.append(result)
+            print(f"{name:<12} {size:>5} {backend:<11} "
+                  f"{result['seconds']:>10.4f}s {result['entailed']:>3} entailed",
+                  file=sys.stderr)
+
+        # Every backend must give the same answers
+        if len(set(map(tuple, answers.values()))) > 1:
+            print(f"{name}: backends disagree: {answers}", file=sys.stderr)
+            for result in results:
+                if result["workload"] == name:
+                    result["agree"] = False
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results
+    }
+    if filename is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {filename}.", file=sys.stderr)
+
+
+def workloads():
+    """Returns a list of (name, knowledge, queries) to benchmark."""
+    result = [
+        ("clue", clue.knowledge.sentence(), clue.symbols),
+        ("harry", harry.knowledge, [harry.rain, harry.hagrid,
+                                    harry.dumbledore]),
+        ("houses", puzzle.knowledge.sentence(), puzzle.symbols),
+        ("mastermind", mastermind.knowledge.sentence(), mastermind.symbols)
+    ]
+
+    # Knights puzzles live in the lab; they import logic from this directory
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "..", "..", "lab", "knights", "puzzle.py")
+    spec = importlib.util.spec_from_file_location("knights", path)
+    knights = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(knights)
+    symbols = [knights.AKnight, knights.AKnave, knights.BKnight,
+               knights.BKnave, knights.CKnight, knights.CKnave]
+    for i in range(4):
+        knowledge = getattr(knights, f"knowledge{i}")
+        result.append((f"knights{i}", knowledge, symbols))
+
+    for size in RANDOM_SIZES:
+        knowledge, queries = random_3sat(size, seed=size)
+        result.append((f"3sat{size}", knowledge, queries))
+    return result
+
+
+def random_3sat(size, seed, ratio=3.8, count=4):
+    """
+    Returns a random knowledge base of round(ratio * size) clauses of three
+    literals over size symbols, and count symbols to query.
+    """
+    generator = random.Random(seed)
+    symbols = [Symbol(f"x{i}") for i in range(size)]
+    clauses = []
+    for _ in range(round(ratio * size)):
+        literals = []
+        for symbol in generator.sample(symbols, 3):
+            literals.append(symbol if generator.random() < 0.5
+                            else Not(symbol))
+        clauses.append(Or(*literals))
+    return And(*clauses), symbols[:count]
+
+
+def run(knowledge, queries, backend):
+    """Answers every query with one backend, timing it."""
+    stats = dict()
+    start = time.perf_counter()
+    if backend == "batch":
+        answers = [status == ENTAILED
+                   for status in model_check_batch(knowledge, queries)]
+    else:
+        answers = [model_check(knowledge, query, backend=backend, stats=stats)
+                   for query in queries]
+    seconds = time.perf_counter() - start
+    return {
+        "backend": backend,
+        "queries": len(queries),
+        "seconds": seconds,
+        "entailed": sum(answers),
+        "answers": answers,
+        "agree": True,
+        "stats": stats
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ for i in range(4):
     for color in colors:
         symbols.append(Symbol(f"{color}{i}"))
 
-knowledge = And()
+knowledge = KnowledgeBase()
 
 # Each color has a position.
 for color in colors:
@@ -51,6 +51,12 @@ knowledge.add(And(
     Not(Symbol("yellow3"))
 ))
 
-for symbol in symbols:
-    if model_check(knowledge, symbol):
-        print(symbol)
+
+def main():
+    for symbol, status in zip(symbols, knowledge.ask_all(symbols)):
+        if status == ENTAILED:
+            print(symbol)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ houses = ["Gryffindor", "Hufflepuff", "Ravenclaw", "Slytherin"]
 
 symbols = []
 
-knowledge = And()
+knowledge = KnowledgeBase()
 
 for person in people:
     for house in houses:
@@ -50,6 +50,12 @@ knowledge.add(
     Symbol("MinervaGryffindor")
 )
 
-for symbol in symbols:
-    if model_check(knowledge, symbol):
-        print(symbol)
+
+def main():
+    for symbol, status in zip(symbols, knowledge.ask_all(symbols)):
+        if status == ENTAILED:
+            print(symbol)
+
+
+if __name__ == "__main__":
+    main()
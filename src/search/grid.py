@@ -0,0 +1,394 @@
+import concurrent.futures
+import mmap
+import os
+
+import numpy as np
+
+# Moves in the order of the columns of GridMaze.neighbors
+ACTIONS = ["up", "down", "left", "right"]
+
+# Bytes of the maze file examined at a time by read_maze
+CHUNK_SIZE = 1 << 24
+
+
+def read_maze(filename, chunk_size=CHUNK_SIZE):
+    """
+    Reads an ASCII maze file in the format Maze reads through a memory
+    map, a chunk of rows at a time, so memory use is bounded by the
+    result rather than the file. Returns (bits, width, start, goal),
+    where bits holds the walls one bit per cell, each row packed by
+    np.packbits; unpack_walls turns it back into a boolean array.
+    """
+    with open(filename, "rb") as f:
+        if f.seek(0, 2) == 0:
+            raise Exception("maze must have exactly one start point")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            starts, ends = line_bounds(data, chunk_size)
+            width = int((ends - starts).max())
+            bits = np.zeros((len(starts), (width + 7) // 8), dtype=np.uint8)
+
+            # Validate start and goal as they are found
+            found = {"A": [], "B": []}
+            names = {"A": "start point", "B": "goal"}
+            first = 0
+            while first < len(starts):
+
+                # Take as many rows as fit in a chunk, and at least one
+                last = int(np.searchsorted(ends, starts[first] + chunk_size))
+                last = min(max(last, first + 1), len(starts))
+                block = read_rows(data, starts[first:last], ends[first:last],
+                                  width)
+                for letter, cells in found.items():
+                    for row, col in np.argwhere(block == ord(letter))[:2]:
+                        cells.append((first + int(row), int(col)))
+                    if len(cells) > 1:
+                        raise Exception(
+                            f"maze must have exactly one {names[letter]}"
+                        )
+
+                walls = ((block != ord(" ")) & (block != ord("A"))
+                         & (block != ord("B")))
+                bits[first:last] = np.packbits(walls, axis=1)
+                first = last
+
+    for letter, cells in found.items():
+        if len(cells) != 1:
+            raise Exception(f"maze must have exactly one {names[letter]}")
+    return (bits, width, found["A"][0], found["B"][0])
+
+
+def line_bounds(data, chunk_size=CHUNK_SIZE):
+    """
+    Returns arrays of the offsets where each line of data starts and
+    ends, not counting line breaks.
+    """
+    breaks, returns = [], []
+    previous = 0
+    for offset in range(0, len(data), chunk_size):
+        chunk = np.frombuffer(data[offset:offset + chunk_size],
+                              dtype=np.uint8)
+        found = np.flatnonzero(chunk == ord("\n"))
+
+        # Note the carriage returns of Windows line breaks
+        before = chunk[found - 1]
+        before[found == 0] = previous
+        breaks.append(found + offset)
+        returns.append(before == ord("\r"))
+        previous = chunk[-1]
+    breaks = np.concatenate(breaks)
+    returns = np.concatenate(returns)
+
+    # A final line break does not start another line
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks - returns, [len(data)]))
+    if starts[-1] == len(data):
+        starts, ends = starts[:-1], ends[:-1]
+    elif previous == ord("\r"):
+        ends[-1] -= 1
+    return (starts, ends)
+
+
+def read_rows(data, starts, ends, width):
+    """
+    Returns the bytes of the lines between starts and ends as a 2-D
+    array, with cells past the end of a short line empty.
+    """
+    lengths = ends - starts
+    buffer = np.frombuffer(data[starts[0]:ends[-1]], dtype=np.uint8)
+
+    # Evenly spaced lines of full width are viewed in place
+    steps = np.diff(starts)
+    if (lengths == width).all() and (steps == steps[:1]).all():
+        step = int(steps[0]) if len(steps) else width
+        return np.lib.stride_tricks.as_strided(
+            buffer, shape=(len(starts), width), strides=(step, 1),
+            writeable=False
+        )
+
+    block = np.full((len(starts), width), ord(" "), dtype=np.uint8)
+    for i, (start, length) in enumerate(zip(starts - starts[0], lengths)):
+        block[i, :length] = buffer[start:start + length]
+    return block
+
+
+def unpack_walls(bits, width):
+    """Returns the boolean wall grid of bits read by read_maze."""
+    return np.unpackbits(bits, axis=1, count=width).view(bool)
+
+
+class GridMaze():
+    """
+    Maze stored as NumPy arrays: a boolean wall grid, cells numbered
+    row by row as int32 states, and a table of each state's neighbors.
+    """
+
+    def __init__(self, walls, start, goal):
+        self.walls = np.asarray(walls, dtype=bool)
+        self.height, self.width = self.walls.shape
+        if self.height * self.width >= 2 ** 31:
+            raise Exception("maze has too many cells")
+        self.start = start
+        self.goal = goal
+        self.neighbors = self.neighbor_table()
+        self.solution = None
+
+    @classmethod
+    def from_file(cls, filename):
+        """Loads an ASCII maze file in the format Maze reads."""
+        bits, width, start, goal = read_maze(filename)
+        return cls(unpack_walls(bits, width), start, goal)
+
+    @classmethod
+    def from_maze(cls, maze):
+        """Converts a Maze."""
+        return cls(maze.walls, maze.start, maze.goal)
+
+    def state(self, cell):
+        """Returns the state number of a (row, column) cell."""
+        return cell[0] * self.width + cell[1]
+
+    def cell(self, state):
+        """Returns the (row, column) cell of a state number."""
+        return divmod(int(state), self.width)
+
+    def neighbor_table(self):
+        """
+        Returns an array with a row per state holding the states reached
+        by moving up, down, left and right, or -1 where there is a wall.
+        """
+        height, width = self.height, self.width
+        states = np.arange(height * width, dtype=np.int32)
+        states = states.reshape(height, width)
+        empty = ~self.walls
+        table = np.full((height, width, 4), -1, dtype=np.int32)
+        table[1:, :, 0] = np.where(empty[:-1, :], states[:-1, :], -1)
+        table[:-1, :, 1] = np.where(empty[1:, :], states[1:, :], -1)
+        table[:, 1:, 2] = np.where(empty[:, :-1], states[:, :-1], -1)
+        table[:, :-1, 3] = np.where(empty[:, 1:], states[:, 1:], -1)
+        table[self.walls] = -1
+        return table.reshape(height * width, 4)
+
+    def solve(self):
+        """
+        Finds a shortest solution by breadth-first search, expanding the
+        whole frontier of each layer at once with array operations.
+        """
+        start, goal = self.state(self.start), self.state(self.goal)
+
+        # Parent of each reached state; the start is its own parent
+        parents = np.full(self.height * self.width, -1, dtype=np.int32)
+        parents[start] = start
+        frontier = np.array([start], dtype=np.int32)
+        self.num_explored = 0
+        while parents[goal] == -1:
+            if frontier.size == 0:
+                raise Exception("no solution")
+            self.num_explored += frontier.size
+
+            # Every move out of the frontier into an unreached state
+            children = self.neighbors[frontier].ravel()
+            sources = np.repeat(frontier, 4)
+            reached = children >= 0
+            children, sources = children[reached], sources[reached]
+            new = parents[children] == -1
+            children, sources = children[new], sources[new]
+
+            # A state reached from several parents keeps the last one
+            parents[children] = sources
+            frontier = children[parents[children] == sources]
+
+        self.explored = (parents >= 0).reshape(self.height, self.width)
+        self.solution = self.path(parents, goal)
+
+    def explored_cells(self):
+        """Returns the set of (row, column) cells reached by solve."""
+        return set(map(tuple, np.argwhere(self.explored).tolist()))
+
+    def path(self, parents, goal):
+        """Returns (actions, cells) from the start to goal."""
+        states = [goal]
+        while parents[states[-1]] != states[-1]:
+            states.append(int(parents[states[-1]]))
+        states.reverse()
+        return self.route(states)
+
+    def route(self, states):
+        """Returns (actions, cells) moving through a list of states."""
+        steps = {-1: "left", 1: "right",
+                 -self.width: "up", self.width: "down"}
+        actions = [steps[b - a] for a, b in zip(states, states[1:])]
+        cells = [self.cell(state) for state in states[1:]]
+        return (actions, cells)
+
+
+class MazeIndex(GridMaze):
+    """
+    Maze loaded once to answer shortest path queries between any two
+    cells. Every cell is labeled with its connected component, so a
+    query between different components is answered without searching.
+    """
+
+    def __init__(self, walls, labels=None):
+        super().__init__(walls, None, None)
+        self.labels = self.component_labels() if labels is None else labels
+
+        # Parents of the states reached from each end of a query, reset
+        # to -1 after each one
+        size = self.height * self.width
+        self.forward = np.full(size, -1, dtype=np.int32)
+        self.backward = np.full(size, -1, dtype=np.int32)
+
+    @classmethod
+    def from_file(cls, filename):
+        """Loads an ASCII maze file, ignoring its start and goal."""
+        bits, width, _, _ = read_maze(filename)
+        return cls(unpack_walls(bits, width))
+
+    @classmethod
+    def from_maze(cls, maze):
+        """Converts a Maze, ignoring its start and goal."""
+        return cls(maze.walls)
+
+    def component_labels(self):
+        """
+        Returns an array giving each state the smallest state in its
+        connected component, or -1 for walls.
+        """
+        size = self.height * self.width
+        labels = np.arange(size, dtype=np.int32)
+
+        # Moves down and right cover every pair of adjacent empty cells
+        sources, targets = [], []
+        for column in (1, 3):
+            moves = self.neighbors[:, column]
+            found = np.flatnonzero(moves >= 0).astype(np.int32)
+            sources.append(found)
+            targets.append(moves[found])
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+
+        # Hook the larger label of each pair of joined components under
+        # the smaller, then point every state straight at its label
+        while True:
+            a, b = labels[sources], labels[targets]
+            apart = a != b
+            if not apart.any():
+                break
+            sources, targets = sources[apart], targets[apart]
+            a, b = a[apart], b[apart]
+            np.minimum.at(labels, np.maximum(a, b), np.minimum(a, b))
+            while True:
+                jumped = labels[labels]
+                if (jumped == labels).all():
+                    break
+                labels = jumped
+
+        labels[self.walls.ravel()] = -1
+        return labels
+
+    def connected(self, start, goal):
+        """Returns whether a path joins the cells start and goal."""
+        for row, col in (start, goal):
+            if not (0 <= row < self.height and 0 <= col < self.width):
+                raise ValueError(f"cell {(row, col)} is outside the maze")
+        label = self.labels[self.state(start)]
+        return bool(label >= 0 and label == self.labels[self.state(goal)])
+
+    def query(self, start, goal):
+        """
+        Returns a shortest (actions, cells) path from the cell start to
+        the cell goal, or None if there is none. Searches breadth-first
+        from both ends, growing the smaller frontier a layer at a time
+        until they meet.
+        """
+        if not self.connected(start, goal):
+            return None
+        source, target = self.state(start), self.state(goal)
+        if source == target:
+            return ([], [])
+
+        parents = [self.forward, self.backward]
+        frontiers = [np.array([source], dtype=np.int32),
+                     np.array([target], dtype=np.int32)]
+        reached = [[frontiers[0]], [frontiers[1]]]
+        self.forward[source] = source
+        self.backward[target] = target
+        try:
+            while True:
+                side = 0 if frontiers[0].size <= frontiers[1].size else 1
+                mine, theirs = parents[side], parents[1 - side]
+                frontier = frontiers[side]
+                if frontier.size == 0:
+                    return None
+
+                # Every move out of the frontier into an unreached state
+                children = self.neighbors[frontier].ravel()
+                sources = np.repeat(frontier, 4)
+                moves = children >= 0
+                children, sources = children[moves], sources[moves]
+                new = mine[children] == -1
+                children, sources = children[new], sources[new]
+                mine[children] = sources
+                children = children[mine[children] == sources]
+                frontiers[side] = children
+                reached[side].append(children)
+
+                # Any state reached from both ends is on a shortest path
+                met = children[theirs[children] != -1]
+                if met.size:
+                    return self.join(int(met[0]))
+        finally:
+            for side in (0, 1):
+                parents[side][np.concatenate(reached[side])] = -1
+
+    def join(self, state):
+        """
+        Returns (actions, cells) from the start of a query through state,
+        where its searches met, to the goal.
+        """
+        states = [state]
+        while self.forward[states[-1]] != states[-1]:
+            states.append(int(self.forward[states[-1]]))
+        states.reverse()
+        while self.backward[states[-1]] != states[-1]:
+            states.append(int(self.backward[states[-1]]))
+        return self.route(states)
+
+    def query_batch(self, queries, workers=None):
+        """
+        Answers a list of (start, goal) queries like query, spreading
+        the connected ones over a pool of worker processes.
+        """
+        answers = [None] * len(queries)
+        pending = [i for i, (start, goal) in enumerate(queries)
+                   if self.connected(start, goal)]
+        if not pending:
+            return answers
+
+        workers = workers or os.cpu_count()
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=start_worker,
+            initargs=(self.walls, self.labels)
+        ) as executor:
+            results = executor.map(
+                answer_query, [queries[i] for i in pending],
+                chunksize=max(1, len(pending) // (4 * workers))
+            )
+            for i, answer in zip(pending, results):
+                answers[i] = answer
+        return answers
+
+
+# Index of the maze in each worker process of MazeIndex.query_batch
+worker_state = dict()
+
+
+def start_worker(walls, labels):
+    """Builds the index once per worker process."""
+    worker_state["index"] = MazeIndex(walls, labels)
+
+
+def answer_query(query):
+    """Answers a (start, goal) query with the worker's index."""
+    return worker_state["index"].query(*query)
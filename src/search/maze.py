@@ -1,21 +1,62 @@
+import heapq
+import itertools
+import math
 import sys
+from collections import deque
+
+STRATEGIES = ["dfs", "bfs", "greedy", "astar", "jps", "wavefront"]
+
+# Row and column change of each move
+MOVES = {
+    "up": (-1, 0),
+    "down": (1, 0),
+    "left": (0, -1),
+    "right": (0, 1)
+}
+
+
+def manhattan(state, goal):
+    """Returns the number of moves from state to goal without walls."""
+    return abs(state[0] - goal[0]) + abs(state[1] - goal[1])
+
+
+def octile(state, goal):
+    """Returns the distance from state to goal allowing diagonal moves."""
+    dr, dc = abs(state[0] - goal[0]), abs(state[1] - goal[1])
+    return max(dr, dc) + (math.sqrt(2) - 1) * min(dr, dc)
+
+
+HEURISTICS = {
+    "manhattan": manhattan,
+    "octile": octile
+}
+
 
 class Node():
-    def __init__(self, state, parent, action):
+    def __init__(self, state, parent, action, cost=None):
         self.state = state
         self.parent = parent
         self.action = action
 
+        # Number of moves from the start
+        if cost is None:
+            cost = 0 if parent is None else parent.cost + 1
+        self.cost = cost
+
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+
+        # Number of nodes in the frontier for each state
+        self.states = dict()
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -24,10 +65,17 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.forget(node.state)
             return node
 
+    def forget(self, state):
+        """Records that one node with state left the frontier."""
+        if self.states[state] == 1:
+            del self.states[state]
+        else:
+            self.states[state] -= 1
+
 
 class QueueFrontier(StackFrontier):
 
@@ -35,10 +83,35 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.forget(node.state)
             return node
 
+
+class PriorityFrontier(StackFrontier):
+    """Removes the node with lowest priority(node) first, oldest on ties."""
+
+    def __init__(self, priority):
+        super().__init__()
+        self.frontier = []
+        self.priority = priority
+        self.count = itertools.count()
+
+    def add(self, node):
+        heapq.heappush(
+            self.frontier, (self.priority(node), next(self.count), node)
+        )
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            _, _, node = heapq.heappop(self.frontier)
+            self.forget(node.state)
+            return node
+
+
 class Maze():
 
     def __init__(self, filename):
@@ -82,7 +155,7 @@ class Maze():
 
 
     def print(self):
-        solution = self.solution[1] if self.solution is not None else None
+        solution = set(self.solution[1]) if self.solution is not None else None
         print()
         for i, row in enumerate(self.walls):
             for j, col in enumerate(row):
@@ -116,20 +189,120 @@ class Maze():
         return result
 
 
-    def solve(self):
-        """Finds a solution to maze, if one exists."""
+    def empty(self, row, col):
+        """Returns whether (row, col) is inside the maze and not a wall."""
+        return (0 <= row < self.height and 0 <= col < self.width
+                and not self.walls[row][col])
+
+
+    def jump(self, state, action):
+        """
+        Moves from state in the direction of action until reaching a jump
+        point, and returns it, or None if the moves lead nowhere.
+
+        Jump Point Search only follows canonical shortest paths, which
+        make their vertical moves as early as possible: a path moving
+        sideways turns up or down only where the cell diagonally behind
+        is a wall, and a path moving up or down may turn sideways anywhere.
+        Jump points are the goal, cells where a sideways path may turn,
+        and cells where a vertical path may turn to reach one of those.
+        """
+        dr, dc = MOVES[action]
+        row, col = state
+        while True:
+            row, col = row + dr, col + dc
+            if not self.empty(row, col):
+                return None
+            if (row, col) == self.goal:
+                return (row, col)
+            if dr == 0:
+                for turn in (-1, 1):
+                    if (self.empty(row + turn, col)
+                            and not self.empty(row + turn, col - dc)):
+                        return (row, col)
+            elif (self.jump((row, col), "left") is not None
+                    or self.jump((row, col), "right") is not None):
+                return (row, col)
+
+
+    def jump_actions(self, state, action):
+        """
+        Returns the moves a canonical path can make from state after
+        arriving by action, or every move from the start.
+        """
+        if action is None:
+            return list(MOVES)
+        if action in ("up", "down"):
+            return [action, "left", "right"]
+        row, col = state
+        dc = MOVES[action][1]
+        result = [action]
+        for turn in ("up", "down"):
+            dr = MOVES[turn][0]
+            if (self.empty(row + dr, col)
+                    and not self.empty(row + dr, col - dc)):
+                result.append(turn)
+        return result
+
+
+    def frontier(self, strategy, heuristic):
+        """Returns an empty frontier that orders nodes for strategy."""
+        distance = HEURISTICS[heuristic]
+        if strategy == "dfs":
+            return StackFrontier()
+        elif strategy == "bfs":
+            return QueueFrontier()
+        elif strategy == "greedy":
+            return PriorityFrontier(
+                lambda node: distance(node.state, self.goal)
+            )
+        elif strategy == "astar":
+
+            # Among equal estimates, prefer nodes closer to the goal
+            def priority(node):
+                h = distance(node.state, self.goal)
+                return (node.cost + h, h)
+            return PriorityFrontier(priority)
+        raise ValueError(f"unknown strategy {strategy}")
+
+    def solve(self, strategy="dfs", heuristic="manhattan"):
+        """
+        Finds a solution to maze, if one exists.
+
+        strategy is "dfs" or "bfs", "greedy" to expand the node the
+        heuristic estimates closest to the goal first, "astar" to
+        expand the lowest path cost plus estimate first, which finds a
+        shortest path, or "wavefront" for breadth-first search over
+        NumPy arrays (see grid.py). "jps" is Jump Point Search: A* that
+        only expands jump points (see jump), finding a shortest path while
+        expanding far fewer nodes on open maps. heuristic is "manhattan"
+        or "octile".
+        """
+        if strategy == "jps":
+            return self.solve_jps(heuristic)
+        if strategy == "wavefront":
+            from grid import GridMaze
+            grid = GridMaze.from_maze(self)
+            grid.solve()
+            self.num_explored = grid.num_explored
+            self.explored = grid.explored_cells()
+            self.solution = grid.solution
+            return
 
         # Keep track of number of states explored
         self.num_explored = 0
 
         # Initialize frontier to just the starting position
         start = Node(state=self.start, parent=None, action=None)
-        frontier = StackFrontier()
+        frontier = self.frontier(strategy, heuristic)
         frontier.add(start)
 
         # Initialize an empty explored set
         self.explored = set()
 
+        # Lowest path cost found so far to each state
+        costs = {self.start: 0}
+
         # Keep looping until solution found
         while True:
 
@@ -137,8 +310,11 @@ class Maze():
             if frontier.empty():
                 raise Exception("no solution")
 
-            # Choose a node from the frontier
+            # Choose a node from the frontier, skipping any superseded by
+            # a cheaper path to the same state
             node = frontier.remove()
+            if node.state in self.explored:
+                continue
             self.num_explored += 1
 
             # If node is the goal, then we have a solution
@@ -157,27 +333,143 @@ class Maze():
             # Mark node as explored
             self.explored.add(node.state)
 
-            # Add neighbors to frontier
+            # Add neighbors to frontier; A* also re-adds a state already
+            # in the frontier when it finds a cheaper path to it
             for action, state in self.neighbors(node.state):
-                if not frontier.contains_state(state) and state not in self.explored:
-                    child = Node(state=state, parent=node, action=action)
-                    frontier.add(child)
+                if state in self.explored:
+                    continue
+                if frontier.contains_state(state) and (
+                    strategy != "astar" or costs[state] <= node.cost + 1
+                ):
+                    continue
+                costs[state] = node.cost + 1
+                child = Node(state=state, parent=node, action=action)
+                frontier.add(child)
+
+
+    def solve_jps(self, heuristic="manhattan"):
+        """
+        Finds a shortest solution by Jump Point Search. Nodes are jump
+        points paired with the move that reached them, since that move
+        decides where a canonical path may go next.
+        """
+        distance = HEURISTICS[heuristic]
+
+        def priority(node):
+            h = distance(node.state[0], self.goal)
+            return (node.cost + h, h)
 
+        self.num_explored = 0
+        self.explored = set()
+        frontier = PriorityFrontier(priority)
+        frontier.add(Node(state=(self.start, None), parent=None, action=None))
+        costs = {(self.start, None): 0}
+        expanded = set()
+        while True:
+            if frontier.empty():
+                raise Exception("no solution")
+            node = frontier.remove()
+            if node.state in expanded:
+                continue
+            expanded.add(node.state)
+            self.num_explored += 1
+            cell, arrival = node.state
+            self.explored.add(cell)
 
-    def output_image(self, filename, show_solution=True, show_explored=False):
+            # Fill in the cells between consecutive jump points
+            if cell == self.goal:
+                actions = []
+                cells = []
+                while node.parent is not None:
+                    row, col = node.state[0]
+                    dr, dc = MOVES[node.action]
+                    for _ in range(node.cost - node.parent.cost):
+                        actions.append(node.action)
+                        cells.append((row, col))
+                        row, col = row - dr, col - dc
+                    node = node.parent
+                actions.reverse()
+                cells.reverse()
+                self.solution = (actions, cells)
+                return
+
+            for action in self.jump_actions(cell, arrival):
+                point = self.jump(cell, action)
+                if point is None:
+                    continue
+                state = (point, action)
+                cost = node.cost + manhattan(cell, point)
+                if state in expanded or costs.get(state, cost + 1) <= cost:
+                    continue
+                costs[state] = cost
+                frontier.add(Node(state=state, parent=node, action=action,
+                                  cost=cost))
+
+
+    def output_image(self, filename, show_solution=True, show_explored=False,
+                     cell_size=50, borders=True):
+        """
+        Draws the maze to filename, cell_size pixels per cell. Very large
+        mazes can leave out the dark borders between cells, and be drawn
+        with a cell_size as small as 1.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            return self.draw_image(filename, show_solution, show_explored,
+                                   cell_size, borders)
+        from PIL import Image
+        cell_border = 2 if borders else 0
+
+        # Colors of walls, empty cells, explored cells, the solution, the
+        # start and the goal, indexed by cell class
+        palette = np.array([
+            (40, 40, 40),
+            (237, 240, 252),
+            (212, 97, 85),
+            (220, 235, 113),
+            (255, 0, 0),
+            (0, 171, 28)
+        ], dtype=np.uint8)
+        classes = np.where(np.array(self.walls, dtype=bool), 0, 1)
+        classes = classes.astype(np.uint8)
+        if self.solution is not None:
+            if show_explored and self.explored:
+                classes[tuple(np.array(list(self.explored)).T)] = 2
+            if show_solution and self.solution[1]:
+                classes[tuple(np.array(self.solution[1]).T)] = 3
+        classes[self.start] = 4
+        classes[self.goal] = 5
+
+        # Stretch each row of cells into a row of pixels, then copy it to
+        # every pixel row inside the cells' border, leaving borders black
+        inside = np.zeros(cell_size, dtype=bool)
+        inside[cell_border:cell_size - cell_border + 1] = True
+        lines = np.repeat(palette[classes], cell_size, axis=1)
+        lines[:, ~np.tile(inside, self.width)] = 0
+        pixels = np.zeros((self.height, cell_size, self.width * cell_size, 3),
+                          dtype=np.uint8)
+        pixels[:, inside] = lines[:, None]
+        pixels = pixels.reshape(self.height * cell_size,
+                                self.width * cell_size, 3)
+
+        Image.fromarray(pixels, "RGB").save(filename)
+
+    def draw_image(self, filename, show_solution=True, show_explored=False,
+                   cell_size=50, borders=True):
+        """Draws the maze like output_image, a cell at a time, without NumPy."""
         from PIL import Image, ImageDraw
-        cell_size = 50
-        cell_border = 2
+        cell_border = 2 if borders else 0
 
         # Create a blank canvas
         img = Image.new(
-            "RGBA",
+            "RGB",
             (self.width * cell_size, self.height * cell_size),
             "black"
         )
         draw = ImageDraw.Draw(img)
 
-        solution = self.solution[1] if self.solution is not None else None
+        solution = set(self.solution[1]) if self.solution is not None else None
         for i, row in enumerate(self.walls):
             for j, col in enumerate(row):
 
@@ -215,15 +507,27 @@ class Maze():
         img.save(filename)
 
 
-if len(sys.argv) != 2:
-    sys.exit("Usage: python maze.py maze.txt")
-
-m = Maze(sys.argv[1])
-print("Maze:")
-m.print()
-print("Solving...")
-m.solve()
-print("States Explored:", m.num_explored)
-print("Solution:")
-m.print()
-m.output_image("maze.png", show_explored=True)
+def main():
+    if not 2 <= len(sys.argv) <= 4:
+        sys.exit("Usage: python maze.py maze.txt "
+                 "[dfs|bfs|greedy|astar|jps|wavefront] [manhattan|octile]")
+    strategy = sys.argv[2] if len(sys.argv) > 2 else "dfs"
+    heuristic = sys.argv[3] if len(sys.argv) > 3 else "manhattan"
+    if strategy not in STRATEGIES:
+        sys.exit(f"Strategy must be one of {', '.join(STRATEGIES)}.")
+    if heuristic not in HEURISTICS:
+        sys.exit(f"Heuristic must be one of {', '.join(HEURISTICS)}.")
+
+    m = Maze(sys.argv[1])
+    print("Maze:")
+    m.print()
+    print("Solving...")
+    m.solve(strategy, heuristic)
+    print("States Explored:", m.num_explored)
+    print("Solution:")
+    m.print()
+    m.output_image("maze.png", show_explored=True)
+
+
+if __name__ == "__main__":
+    main()